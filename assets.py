@@ -0,0 +1,135 @@
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageFont
+
+# Set PAPERCAL_FONT to a font file (or several, separated by os.pathsep) to
+# use instead of the defaults below
+FONT_PATH_ENV = "PAPERCAL_FONT"
+# Tried in order after any configured font; Pillow's built-in font is the last resort
+DEFAULT_FONT_PATHS = (
+    "/System/Library/Fonts/Helvetica.ttc",  # macOS
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",  # Debian/Ubuntu
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",  # Arch
+    "C:\\Windows\\Fonts\\arial.ttf",  # Windows
+)
+WEATHER_ICON_DIR = "./weather_icons"
+
+
+def font_paths() -> List[str]:
+    """
+    Return the font files to try, configured ones first.
+    """
+    configured = os.getenv(FONT_PATH_ENV, "")
+    return [path for path in configured.split(os.pathsep) if path] + list(
+        DEFAULT_FONT_PATHS
+    )
+
+
+def binarize_icon(icon: Image.Image) -> Image.Image:
+    """
+    Flatten a weather icon onto white and convert it to a 1-bit bitmap.
+    """
+    if icon.mode == "RGBA":
+        white_bg = Image.new("1", icon.size, (255, 255, 255))
+        white_bg.paste(icon, mask=icon.split()[-1])
+        icon = white_bg
+    return icon.convert("1")
+
+
+class AssetRegistry:
+    """
+    Process-wide cache of fonts and 1-bit weather icons, so each is loaded
+    and decoded at most once no matter how many frames are rendered.
+    """
+
+    def __init__(self, icon_dir: str = WEATHER_ICON_DIR):
+        self.icon_dir = Path(icon_dir)
+        self._fonts = {}
+        self._icons = {}
+        self._lock = threading.Lock()
+        self.font_loads = 0
+        self.font_hits = 0
+        self.icon_loads = 0
+        self.icon_hits = 0
+
+    def font(self, size: int) -> ImageFont.FreeTypeFont:
+        """
+        Return the first loadable font in the fallback chain at the given size.
+        """
+        with self._lock:
+            font = self._fonts.get(size)
+            if font is not None:
+                self.font_hits += 1
+                return font
+
+            for path in font_paths():
+                try:
+                    font = ImageFont.truetype(path, size)
+                    break
+                except OSError:
+                    continue
+            else:
+                print(f"No usable font found at size {size}, using default font.")
+                font = ImageFont.load_default()
+            self._fonts[size] = font
+            self.font_loads += 1
+            return font
+
+    def icon(self, name: str) -> Optional[Image.Image]:
+        """
+        Return the named weather icon as a ready-to-paste 1-bit bitmap, or
+        None if it does not exist or cannot be decoded. Callers must not
+        modify the returned image.
+        """
+        with self._lock:
+            if name in self._icons:
+                self.icon_hits += 1
+                return self._icons[name]
+
+            icon = None
+            path = self.icon_dir / name
+            if path.exists():
+                try:
+                    with Image.open(path) as source:
+                        icon = binarize_icon(source)
+                except Exception as e:
+                    print(f"Error rendering weather icon: {e}")
+            # Missing or broken icons are remembered too, so they are not retried
+            self._icons[name] = icon
+            self.icon_loads += 1
+            return icon
+
+    def preload(self) -> None:
+        """
+        Decode every icon in the icon directory up front.
+        """
+        if self.icon_dir.exists():
+            for path in sorted(self.icon_dir.glob("*.png")):
+                self.icon(path.name)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return load/hit counters for fonts and icons.
+        """
+        return {
+            "font_loads": self.font_loads,
+            "font_hits": self.font_hits,
+            "icon_loads": self.icon_loads,
+            "icon_hits": self.icon_hits,
+        }
+
+    def summary(self) -> str:
+        """
+        One line of stats, to confirm each font and icon was loaded once.
+        """
+        return (
+            f"Assets: {self.font_loads} font size(s) loaded "
+            f"({self.font_hits} reused), {self.icon_loads} weather icon(s) "
+            f"decoded ({self.icon_hits} reused)"
+        )
+
+
+ASSETS = AssetRegistry()
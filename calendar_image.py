@@ -1,9 +1,42 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Dict
-import hashlib
 import os
-from weather import get_weather_data
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from weather import get_cached_weather_data
+from dithering import (
+    KERNELS,
+    KERNEL_ALIASES,
+    error_diffusion_dither,
+    is_ordered_method,
+    ordered_dither,
+)
+from assets import ASSETS
+from compositor import column_mask, composite, place_plane, to_plane
+from display_profile import DEFAULT_PROFILE, DisplayProfile, caches_for, to_panel_frame
+from image_to_esp import pack_image, unpack_image
+from photo_index import PhotoIndex, photo_digest
+from photo_loader import StageStats, load_photo, record_stage
+from layer_cache import LayerCache, make_key
+from event_layout import layout_day
+from text_layout import wrap_text
+
+# Each display profile has its own caches (see display_profile.caches_for):
+# finished 1-bit photo layers, keyed by photo contents, size and dithering;
+# header and event layers, keyed by the inputs they are drawn from; and
+# finished frames for every slot of the week (see render_week_frames)
+
+# Frame slot of the full-frame photo shown on weekends and Friday evenings
+PHOTO_SLOT = 5
+
+# Layout; the panel size, header height and hours shown come from the profile
+MIN_LABEL_WIDTH = 16  # narrower event blocks are drawn without a label
 
 
 def create_weekly_calendar_image(
@@ -12,95 +45,452 @@ def create_weekly_calendar_image(
     current_weekday=None,
     latitude=None,
     longitude=None,
+    profile: DisplayProfile = DEFAULT_PROFILE,
 ) -> Image.Image:
-    # Load random photo and convert to black and white/cropped
-    photo_img = get_weekly_image()
+    """
+    Render the calendar as a 1-bit image (see create_weekly_calendar_frame),
+    as laid out, before rotation onto the panel.
+    """
+    frame = create_weekly_calendar_frame(
+        events,
+        dithering=dithering,
+        current_weekday=current_weekday,
+        latitude=latitude,
+        longitude=longitude,
+        profile=profile,
+    )
+    return frame_image(frame, profile)
+
+
+def create_weekly_calendar_frame(
+    events: List[Dict],
+    dithering="atkinson",
+    current_weekday=None,
+    latitude=None,
+    longitude=None,
+    profile: DisplayProfile = DEFAULT_PROFILE,
+) -> bytearray:
+    """
+    Return the frame to show now (or on current_weekday), as packed 1-bit
+    planes of the profile's canvas (see compositor.py); to_panel_frame
+    converts it to the panel's own format.
+    Frames come from the frame store; on a miss the whole week is rendered
+    and stored at once, so later runs this week only select a frame.
+    """
     current_date = datetime.now()
     if current_weekday is None:
         # Use current weekday if not provided
         current_weekday = current_date.weekday()
-    is_weekday = current_weekday < 5
+    slot = frame_slot(current_weekday, current_date.hour)
+
+    # Resolve this week's photo; it is only decoded on a dithered-layer cache miss
+    photo_path = get_weekly_image_path()
+    weekday_weather = _get_weekday_weather(latitude, longitude)
+    keys = _week_frame_keys(events, weekday_weather, dithering, photo_path, profile)
+
+    frame = caches_for(profile).frames.get(keys[slot])
+    frame_size = profile.plane_width * profile.canvas_size[1] // 8
+    if frame is not None and len(frame) == frame_size:
+        return frame
+    frames = _render_week(
+        events, dithering, weekday_weather, photo_path, keys, profile
+    )
+    return frames[slot]
 
-    if not is_weekday:
-        # Weekend: return black and white photo, cropped to 800x480
-        bw_photo = convert_to_black_and_white(
-            crop_photo(photo_img, is_weekday=False).resize((800, 480)), method=dithering
-        )
-        return bw_photo
 
+def frame_slot(current_weekday: int, hour: int) -> int:
+    """
+    Return which of the week's frames to show: 0-4 for the weekday calendar,
+    or PHOTO_SLOT for the full-frame photo on weekends.
+    """
+    if current_weekday >= 5:
+        return PHOTO_SLOT
     # This seems iffy, may adjust implementation to include timezones?
-    # If its past 4pm on a Friday, return black and white photo, cropped to 800x480
-    if current_weekday == 4 and current_date.hour >= 16:
-        bw_photo = convert_to_black_and_white(
-            crop_photo(photo_img, is_weekday=False).resize((800, 480)), method=dithering
+    # If its past 4pm on a Friday, show the photo too
+    if current_weekday == 4 and hour >= 16:
+        return PHOTO_SLOT
+    return current_weekday
+
+
+def render_week_frames(
+    events: List[Dict],
+    dithering: str = "atkinson",
+    latitude: float = None,
+    longitude: float = None,
+    profile: DisplayProfile = DEFAULT_PROFILE,
+) -> Dict[int, bytearray]:
+    """
+    Render every frame of the current week in one pass and save them to the
+    profile's frame store. Returns the packed frames keyed by slot: the
+    calendar for weekdays 0-4 and the full-frame photo (PHOTO_SLOT).
+    """
+    photo_path = get_weekly_image_path()
+    weekday_weather = _get_weekday_weather(latitude, longitude)
+    keys = _week_frame_keys(events, weekday_weather, dithering, photo_path, profile)
+    return _render_week(events, dithering, weekday_weather, photo_path, keys, profile)
+
+
+def _render_week(
+    events: List[Dict],
+    dithering: str,
+    weekday_weather: List[Dict],
+    photo_path: str,
+    keys: Dict[int, str],
+    profile: DisplayProfile,
+) -> Dict[int, bytearray]:
+    # The grid, event layer and photo planes are shared by every frame
+    fonts = _load_fonts()
+    events_layer = _events_layer(events, fonts, profile)
+    photo_plane = _photo_plane(photo_path, dithering, profile)
+
+    frames = {}
+    for weekday in range(5):
+        header_layer = _header_layer(weekday_weather, weekday, fonts, profile)
+        calendar = pack_image(_calendar_layers(header_layer, events_layer, profile))
+        frames[weekday] = (
+            calendar
+            if weekday == 0
+            else reveal_photo(calendar, photo_plane, weekday, profile)
         )
-        return bw_photo
+    # Weekend: black and white photo, cropped to the whole canvas
+    frames[PHOTO_SLOT] = pack_image(
+        _pad_to_plane(
+            get_dithered_photo(
+                photo_path, is_weekday=False, dithering=dithering, profile=profile
+            ),
+            profile,
+        )
+    )
 
-    # Weekday: proceed with calendar image
-    img = Image.new("1", (800, 480), 255)  # 'L' mode for grayscale
-    draw = ImageDraw.Draw(img, mode="1")
+    frame_cache = caches_for(profile).frames
+    for slot, frame in frames.items():
+        try:
+            frame_cache.put(keys[slot], frame)
+        except OSError as e:
+            print(f"Error caching calendar frame: {e}")
+    return frames
 
 
-    # Define dimensions
-    margin = 50  # top margin only (for day headers/weather)
-    left_margin = 0  # no left sidebar — times are on each event
-    day_width = (800 - left_margin) / 5  # 5 days
-    hour_height = (480 - margin) / 10  # Show 8am - 6pm (10 hours)
+def render_week_batch(
+    events: List[Dict],
+    ditherings: List[str],
+    latitude: float = None,
+    longitude: float = None,
+    max_workers: int = None,
+    profile: DisplayProfile = DEFAULT_PROFILE,
+) -> Dict[str, Dict[int, bytearray]]:
+    """
+    Render the current week's frames (see render_week_frames) for several
+    dithering methods. The shared work is planned up front: the weather is
+    fetched once, and each photo variant missing from the photo cache is
+    dithered once, in parallel worker processes since dithering is CPU-bound.
+    The frames are then composed from the warm caches.
+    Returns {dithering: {slot: frame}}.
+    """
+    photo_path = get_weekly_image_path()
+    weekday_weather = _get_weekday_weather(latitude, longitude)
+    ditherings = list(dict.fromkeys(ditherings))
+
+    photo_cache = caches_for(profile).photos
+    jobs = [
+        (photo_path, is_weekday, dithering, profile)
+        for dithering in ditherings
+        for is_weekday in (True, False)
+        if _photo_key(photo_path, profile.photo_size(is_weekday), dithering)
+        not in photo_cache
+    ]
+    workers = min(len(jobs), max_workers or os.cpu_count() or 1)
+    # With a single worker, the photos are dithered inline while composing
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Workers write straight to the on-disk photo cache
+            list(executor.map(_dither_photo_job, jobs))
+
+    return {
+        dithering: _render_week(
+            events,
+            dithering,
+            weekday_weather,
+            photo_path,
+            _week_frame_keys(
+                events, weekday_weather, dithering, photo_path, profile
+            ),
+            profile,
+        )
+        for dithering in ditherings
+    }
 
-    # Load fonts
-    try:
-        font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 12)
-        header_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 14)
-    except Exception as e:
-        print(f"Error loading fonts: {e}, using default font.")
-        font = ImageFont.load_default()
-        header_font = ImageFont.load_default()
 
-    # Draw grid with solid black lines
-    for i in range(6):  # Vertical lines
-        x = left_margin + (i * day_width)
-        draw.line([(x, margin), (x, 480)], fill=0, width=2)
+def _dither_photo_job(job) -> None:
+    photo_path, is_weekday, dithering, profile = job
+    get_dithered_photo(
+        photo_path, is_weekday=is_weekday, dithering=dithering, profile=profile
+    )
 
-    for i in range(11):  # Horizontal lines
-        y = margin + (i * hour_height)
-        draw.line([(left_margin, y), (800, y)], fill=0, width=2)
 
+def _week_frame_keys(
+    events: List[Dict],
+    weekday_weather: List[Dict],
+    dithering: str,
+    photo_path: str,
+    profile: DisplayProfile,
+) -> Dict[int, str]:
+    """
+    Frame store keys for each slot of this week, from (week, weekday,
+    event hash, weather hash) plus the photo, dithering, fonts and profile.
+    """
+    week = current_week_number()
+    events_hash = make_key(_events_fingerprint(events))
+    weather_hash = make_key(weekday_weather)
+    inputs = (
+        photo_digest(photo_path),
+        dithering,
+        _font_fingerprint(_load_fonts()),
+        profile,
+    )
+    return {
+        slot: make_key("frame", week, slot, events_hash, weather_hash, inputs)
+        for slot in range(PHOTO_SLOT + 1)
+    }
+
+
+def _get_weekday_weather(latitude=None, longitude=None) -> List[Dict]:
     # Get weather data for the week
     try:
-        weather_data = get_weather_data(latitude, longitude)
+        weather_data = get_cached_weather_data(latitude, longitude)
         # Get Monday-Friday weather data (weekdays only)
-        weekday_weather = weather_data[:5]  # First 5 days (Mon-Fri)
+        return weather_data[:5]  # First 5 days (Mon-Fri)
     except Exception as e:
         print(f"Error getting weather data: {e}")
-        weekday_weather = []
+        return []
+
+
+def _calendar_layers(
+    header_layer: Image.Image, events_layer: Image.Image, profile: DisplayProfile
+) -> Image.Image:
+    """
+    Composite grid, header and events, everything but the photo reveal.
+    """
+    img = _grid_layer(profile).copy()
+    _composite(img, header_layer)
+    _composite(img, events_layer)
+    return img
+
+
+def _photo_plane(
+    photo_path: str, dithering: str, profile: DisplayProfile
+) -> np.ndarray:
+    """
+    The weekday photo as a packed full-frame plane, placed below the header.
+    """
+    return _packed_photo_plane(
+        photo_path, photo_digest(photo_path), dithering, profile
+    )
+
+
+@lru_cache(maxsize=8)
+def _packed_photo_plane(
+    photo_path: str, digest: str, dithering: str, profile: DisplayProfile
+) -> np.ndarray:
+    bw_photo = _pad_to_plane(
+        get_dithered_photo(
+            photo_path, is_weekday=True, dithering=dithering, profile=profile
+        ),
+        profile,
+    )
+    plane = place_plane(
+        pack_image(bw_photo),
+        bw_photo.width,
+        bw_photo.height,
+        profile.plane_width,
+        profile.canvas_size[1],
+        profile.header_height,
+    )
+    plane.flags.writeable = False
+    return plane
+
+
+def _pad_to_plane(img: Image.Image, profile: DisplayProfile) -> Image.Image:
+    """
+    Widen a canvas-wide image with white to the plane width, so its rows
+    pack to whole bytes.
+    """
+    if img.width == profile.plane_width:
+        return img
+    padded = Image.new("1", (profile.plane_width, img.height), 255)
+    padded.paste(img, (0, 0))
+    return padded
+
 
-    # Load weather font to match icon size (~20px icons)
+def frame_image(frame, profile: DisplayProfile = DEFAULT_PROFILE) -> Image.Image:
+    """
+    Unpack a rendered frame into a 1-bit image of the canvas.
+    """
+    width, height = profile.canvas_size
+    img = unpack_image(frame, profile.plane_width, height)
+    return img if img.width == width else img.crop((0, 0, width, height))
+
+
+def reveal_photo(
+    calendar,
+    photo_plane: np.ndarray,
+    current_weekday: int,
+    profile: DisplayProfile = DEFAULT_PROFILE,
+) -> bytearray:
+    """
+    Overlay the photo over prior days (including events) on a packed calendar
+    frame, with bytewise AND/OR against a cached per-weekday column mask.
+    """
+    width, height = profile.canvas_size
+    # Add 8 pixels to cover the grid line between days
+    right = int((current_weekday / 5) * width + 8)
+    mask = column_mask(
+        profile.plane_width, height, profile.header_height, height, right
+    )
+    return composite(
+        to_plane(calendar, profile.plane_width, height), photo_plane, mask
+    )
+
+
+class _LayerCanvas:
+    """
+    Draws onto a white 1-bit layer and records every touched pixel in a mask,
+    so the layer can later be pasted over the layers beneath it.
+    """
+
+    def __init__(self, size):
+        self.ink = Image.new("1", size, 255)
+        self.mask = Image.new("1", size, 0)
+        self.draw = ImageDraw.Draw(self.ink, mode="1")
+        self.mask_draw = ImageDraw.Draw(self.mask, mode="1")
+
+    def text(self, xy, text, fill, font):
+        self.draw.text(xy, text, fill=fill, font=font)
+        self.mask_draw.text(xy, text, fill=255, font=font)
+
+    def rectangle(self, xy, fill, outline, width):
+        self.draw.rectangle(xy, fill=fill, outline=outline, width=width)
+        self.mask_draw.rectangle(xy, fill=255, outline=255, width=width)
+
+    def paste(self, im, xy):
+        self.ink.paste(im, xy)
+        self.mask.paste(255, (xy[0], xy[1], xy[0] + im.width, xy[1] + im.height))
+
+    def to_layer(self) -> Image.Image:
+        """
+        Return the layer as one 1-bit image twice the canvas height: the ink
+        on top and the mask below, which stays small and fast to decode.
+        """
+        layer = Image.new("1", (self.ink.width, self.ink.height * 2), 0)
+        layer.paste(self.ink, (0, 0))
+        layer.paste(self.mask, (0, self.ink.height))
+        return layer
+
+
+def _composite(img: Image.Image, layer: Image.Image) -> None:
+    """
+    Paste a layer (see _LayerCanvas.to_layer) onto img where it has ink.
+    """
+    width, height = layer.width, layer.height // 2
+    ink = layer.crop((0, 0, width, height))
+    mask = layer.crop((0, height, width, height * 2))
+    img.paste(ink, (0, 0), mask)
+
+
+def _cached_layer(key: str, render, profile: DisplayProfile) -> Image.Image:
+    """
+    Return the layer cached under key in the profile's layer cache,
+    rendering and storing it on a miss.
+    """
+    layer_cache = caches_for(profile).layers
+    layer = layer_cache.get(key)
+    if layer is not None:
+        return layer
+    layer = render()
     try:
-        weather_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 16)
-    except Exception:
-        weather_font = font
+        layer_cache.put(key, layer)
+    except OSError as e:
+        print(f"Error caching calendar layer: {e}")
+    return layer
+
+
+def _load_fonts():
+    """
+    Return (event font, day label font, weather font).
+    """
+    # Weather font is sized to match the ~20px icons
+    return ASSETS.font(12), ASSETS.font(14), ASSETS.font(16)
+
+
+def _font_fingerprint(fonts) -> tuple:
+    """
+    Identify loaded fonts well enough to tell whether a cached layer used them.
+    """
+    return tuple(
+        (
+            type(font).__name__,
+            font.getname() if hasattr(font, "getname") else None,
+            getattr(font, "size", None),
+        )
+        for font in fonts
+    )
+
+
+@lru_cache(maxsize=8)
+def _grid_layer(profile: DisplayProfile) -> Image.Image:
+    """
+    The static grid, identical on every weekday; only built once per process
+    for each profile.
+    """
+    width, height = profile.canvas_size
+    img = Image.new("1", (profile.plane_width, height), 255)
+    draw = ImageDraw.Draw(img, mode="1")
+
+    # Draw grid with solid black lines
+    for i in range(6):  # Vertical lines
+        x = i * profile.day_width
+        draw.line([(x, profile.header_height), (x, height)], fill=0, width=2)
+
+    for i in range(profile.hours + 1):  # Horizontal lines
+        y = profile.header_height + (i * profile.hour_height)
+        draw.line([(0, y), (width, y)], fill=0, width=2)
+    return img
+
+
+def _header_layer(
+    weekday_weather: List[Dict], current_weekday: int, fonts, profile: DisplayProfile
+) -> Image.Image:
+    """
+    Weather and day labels; changes when the forecast or the day changes.
+    """
+    key = make_key(
+        "header", weekday_weather, current_weekday, _font_fingerprint(fonts), profile
+    )
+    return _cached_layer(
+        key,
+        lambda: _render_header(weekday_weather, current_weekday, fonts, profile),
+        profile,
+    )
+
+
+def _render_header(
+    weekday_weather: List[Dict], current_weekday: int, fonts, profile: DisplayProfile
+) -> Image.Image:
+    _, header_font, weather_font = fonts
+    canvas = _LayerCanvas((profile.plane_width, profile.canvas_size[1]))
+    day_width = profile.day_width
 
     # Add day labels with weather icon + temp above, day name below
     days = ["MON", "TUE", "WED", "THU", "FRI"]
     for i, day in enumerate(days):
-        col_center = left_margin + (i * day_width) + (day_width / 2)
+        col_center = (i * day_width) + (day_width / 2)
         text_color = 128 if i < current_weekday else 0
 
         # Row 1: icon + temp (centered as a group) — skip past days
         icon_img = None
         if i < len(weekday_weather) and i >= current_weekday:
             weather = weekday_weather[i]
-            weather_icon_path = f"./weather_icons/{weather['icon']}"
-            if os.path.exists(weather_icon_path):
-                try:
-                    weather_icon = Image.open(weather_icon_path)
-                    if weather_icon.mode == "RGBA":
-                        white_bg = Image.new("1", weather_icon.size, (255, 255, 255))
-                        white_bg.paste(weather_icon, mask=weather_icon.split()[-1])
-                        weather_icon = white_bg
-                    icon_img = weather_icon.convert("1")
-                except Exception as e:
-                    print(f"Error rendering weather icon: {e}")
+            icon_img = ASSETS.icon(weather["icon"])
 
             temp_text = f"{int(weather['temp_max'])}° / {int(weather['temp_min'])}°"
             temp_width = weather_font.getlength(temp_text)
@@ -111,39 +501,46 @@ def create_weekly_calendar_image(
 
             # Draw icon
             if icon_img:
-                img.paste(icon_img, (int(group_x), 2))
+                canvas.paste(icon_img, (int(group_x), 2))
 
             # Draw temp text vertically centered with icon
-            draw.text((int(group_x + icon_w + gap), 2), temp_text, fill=text_color, font=weather_font)
+            canvas.text((int(group_x + icon_w + gap), 2), temp_text, fill=text_color, font=weather_font)
 
         # Row 2: day label centered below
         day_width_px = header_font.getlength(day)
-        draw.text((col_center - day_width_px / 2, 26), day, fill=text_color, font=header_font)
-
-    # Helper function for word wrapping
-    def wrap_text(text: str, font: ImageFont, max_width: int) -> List[str]:
-        words = text.split()
-        lines = []
-        current_line = []
-
-        for word in words:
-            current_line.append(word)
-            line_width = font.getlength(" ".join(current_line))
-            if line_width > max_width:
-                if len(current_line) == 1:
-                    lines.append(current_line[0])
-                    current_line = []
-                else:
-                    current_line.pop()
-                    lines.append(" ".join(current_line))
-                    current_line = [word]
-
-        if current_line:
-            lines.append(" ".join(current_line))
-        return lines
+        canvas.text((col_center - day_width_px / 2, 26), day, fill=text_color, font=header_font)
+
+    return canvas.to_layer()
+
+
+def _events_layer(events: List[Dict], fonts, profile: DisplayProfile) -> Image.Image:
+    """
+    Event blocks; changes only when the week's events change. Past and
+    upcoming days are drawn alike, so the layer does not depend on the day.
+    """
+    key = make_key(
+        "events", _events_fingerprint(events), _font_fingerprint(fonts), profile
+    )
+    return _cached_layer(key, lambda: _render_events(events, fonts, profile), profile)
+
+
+def _events_fingerprint(events: List[Dict]) -> list:
+    """
+    The parts of the week's events that the event layer is drawn from.
+    """
+    return [
+        (event["summary"], event["start"].isoformat(), event["end"].isoformat())
+        for event in events
+        if event["start"].weekday() <= 4
+    ]
+
+
+def _render_events(events: List[Dict], fonts, profile: DisplayProfile) -> Image.Image:
+    font = fonts[0]
+    canvas = _LayerCanvas((profile.plane_width, profile.canvas_size[1]))
 
     # Draw events with high contrast
-    # First, group events by day and find overlaps
+    # First, group events by day
     day_events = {i: [] for i in range(5)}  # Monday to Friday
     for event in events:
         if event["start"].weekday() > 4:  # Skip weekend events
@@ -154,111 +551,67 @@ def create_weekly_calendar_image(
     for day in day_events.values():
         day.sort(key=lambda x: x["start"])
 
-    # Draw events with offsets for overlaps
+    # Overlapping events share the day's width in side-by-side columns
     for day_idx, day_event_list in day_events.items():
-        is_past_day = day_idx < current_weekday
-        active_times = []
-
-        for event in day_event_list:
-            start_hour = event["start"].hour + event["start"].minute / 60
-            end_hour = event["end"].hour + event["end"].minute / 60
-
-            # Clip to visible hours (8am - 6pm)
-            start_hour = max(8, min(18, start_hour))
-            end_hour = max(8, min(18, end_hour))
-
-            # Remove finished time ranges
-            active_times = [(s, e) for s, e in active_times if e > start_hour]
-
-            # Calculate offset based on overlapping time ranges
-            offset = 0
-            for s, e in active_times:
-                if start_hour < e and end_hour > s:
-                    offset += 1
-
-            # Add this event's time range
-            active_times.append((start_hour, end_hour))
-
-            # Calculate position with offset
-            x1 = left_margin + (day_idx * day_width)
-            y1 = margin + (start_hour - 8) * hour_height
-            x2 = x1 + day_width - (offset * 10)  # Reduce width for offset events
-            y2 = margin + (end_hour - 8) * hour_height
-
-            # Add horizontal offset
-            x1 += offset * 10
-
-            # Adjust colors based on whether the day is in the past
-            border_color = 0 if is_past_day else 0  # Darker gray for past events
-            fill_color = (
-                0 if is_past_day else 0
-            )  # Slightly gray fill for past events
-            text_color = 255 if is_past_day else 255  # Gray text for past events
-
-            # Draw event rectangle with adjusted colors
-            draw.rectangle(
+        day_x = day_idx * profile.day_width
+        for box in layout_day(
+            day_event_list,
+            day_x,
+            profile.day_width,
+            profile.header_height,
+            profile.hour_height,
+            first_hour=profile.first_hour,
+            last_hour=profile.last_hour,
+        ):
+            x1, y1, x2, y2 = box.x1, box.y1, box.x2, box.y2
+
+            # Black blocks with white text, on past and upcoming days alike
+            canvas.rectangle(
                 [(x1 + 1, y1), (x2 - 1, y2)],
-                fill=fill_color,
-                outline=border_color,
+                fill=0,
+                outline=0,
                 width=2,
             )
 
-            # Add event text with adjusted color
+            available_width = (x2 - x1) - 10
+            if available_width < MIN_LABEL_WIDTH:
+                # Too narrow to hold even an ellipsis
+                continue
+
+            # Add event text
+            event = box.event
             time_str = f"{event['start'].strftime('%I:%M%p')} "
             text = time_str + event["summary"]
 
             # Calculate event duration in hours
-            duration = end_hour - start_hour
+            duration = box.end_hour - box.start_hour
 
             if duration >= 1.0:  # For events 1 hour or longer
-                available_width = (day_width - 10) - (offset * 10)
-                lines = wrap_text(text, font, available_width)
+                lines = wrap_text(text, font, available_width, max_lines=3)
 
                 line_height = font.size + 2
                 text_y = y1 + 2
 
-                for line in lines[:3]:
-                    draw.text((x1 + 5, text_y), line, fill=text_color, font=font)
+                for line in lines:
+                    canvas.text((x1 + 5, text_y), line, fill=255, font=font)
                     text_y += line_height
             else:
-                text = text[: 20 - (offset * 2)]
-                draw.text((x1 + 5, y1 + 2), text, fill=text_color, font=font)
-
-    # Overlay black and white cropped photo over prior days (including events)
-    photo_width = 800 - left_margin
-    photo_height = 480 - margin
-    bw_photo = convert_to_black_and_white(
-        crop_photo(photo_img, is_weekday=True).resize((photo_width, photo_height)), method=dithering
-    )
-    if current_weekday > 0:
-        # Calculate region for all past days as a single block
-        x1 = int(left_margin)
-        y1 = int(margin)
-        # Add 2 pixels to x2 to cover the grid line between days
-        x2 = int(left_margin + (current_weekday * day_width) + 8)
-        y2 = int(480)
-        # Corresponding region in the photo
-        photo_x1 = 0
-        photo_x2 = int((current_weekday / 5) * bw_photo.width + 8)
-        day_crop = bw_photo.crop(
-            (photo_x1, 0, min(photo_x2, bw_photo.width), bw_photo.height)
-        )
-        # Paste onto calendar image as one block
-        img.paste(day_crop, (x1, y1))
+                # Shorter events only have room for one line
+                line = wrap_text(text, font, available_width, max_lines=1)[0]
+                canvas.text((x1 + 5, y1 + 2), line, fill=255, font=font)
 
-    return img
+    return canvas.to_layer()
 
 
 def load_random_photo(photo_dir: str = "./photos") -> tuple[Image.Image, str]:
     """
     Load a random photo from the specified directory
     """
-    import os
     import random
 
     photos = [
         f
-        for f in os.listdir(photo_dir)
+        for f in PhotoIndex.for_folder(photo_dir).images()
         if f.lower().endswith((".png", ".jpg", ".jpeg"))
     ]
     if not photos:
@@ -271,45 +624,77 @@ def load_random_photo(photo_dir: str = "./photos") -> tuple[Image.Image, str]:
     return img, selected_photo
 
 
-def crop_photo(img: Image.Image, is_weekday: bool) -> Image.Image:
+def get_dithered_photo(
+    photo_path: str,
+    is_weekday: bool,
+    dithering: str = "atkinson",
+    cache: LayerCache = None,
+    stats: List[StageStats] = None,
+    profile: DisplayProfile = DEFAULT_PROFILE,
+) -> Image.Image:
+    """
+    Return the photo resized and dithered to a 1-bit layer sized for the
+    profile (see DisplayProfile.photo_size).
+    Layers are cached on disk by (photo bytes, target size, dithering method),
+    in the profile's photo cache unless another cache is given, so a warm
+    call skips decoding, resizing and dithering entirely.
+    Pass a list as stats to collect per-stage timings and memory use on a miss.
+    """
+    if cache is None:
+        cache = caches_for(profile).photos
+    size = profile.photo_size(is_weekday)
+    key = _photo_key(photo_path, size, dithering)
+
+    bw_photo = cache.get(key)
+    if bw_photo is not None:
+        return bw_photo
+
+    photo = load_photo(photo_path, size, stats)
+    start = time.perf_counter()
+    bw_photo = convert_to_black_and_white(photo, method=dithering)
+    record_stage(stats, "dither", start, bw_photo)
+    try:
+        cache.put(key, bw_photo)
+    except OSError as e:
+        print(f"Error caching dithered photo: {e}")
+    return bw_photo
+
+
+def _photo_key(photo_path: str, size, dithering: str) -> str:
+    return make_key("photo", photo_digest(photo_path), size, dithering)
+
+
+def crop_photo(
+    img: Image.Image, is_weekday: bool, profile: DisplayProfile = DEFAULT_PROFILE
+) -> Image.Image:
     """
     Resize the photo to the appropriate size based on whether it's a weekday or weekend.
     No cropping, just resize to fit the target dimensions.
     """
-    target_width = 800  # full width (no left sidebar)
-    target_height = 430 if is_weekday else 480
-    return img.resize((target_width, target_height), Image.LANCZOS)
+    return img.resize(profile.photo_size(is_weekday), Image.LANCZOS)
 
 
 def atkinson_dither(img: Image.Image) -> Image.Image:
     """
     Convert the image to black and white using Atkinson dithering.
     """
-    img = img.convert("L")
-    pixels = img.load()
-    w, h = img.size
-    for y in range(h):
-        for x in range(w):
-            old_pixel = pixels[x, y]
-            new_pixel = 0 if old_pixel < 128 else 255
-            pixels[x, y] = new_pixel
-            quant_error = (old_pixel - new_pixel) // 8
-            for dx, dy in [(1, 0), (2, 0), (-1, 1), (0, 1), (1, 1), (0, 2)]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < w and 0 <= ny < h:
-                    pixels[nx, ny] = max(0, min(255, pixels[nx, ny] + quant_error))
-    return img.convert("1")
+    return error_diffusion_dither(img, method="atkinson")
 
 
 def convert_to_black_and_white(
-    img: Image.Image, method: str = "atkinson"
+    img: Image.Image, method: str = "atkinson", serpentine: bool = False
 ) -> Image.Image:
     """
     Convert the image to black and white using the specified dithering method.
-    method: 'floyd' (default) or 'atkinson'
+    method: 'atkinson' (default), 'floyd', 'stucki', 'burkes', 'sierra' or 'jjn'
+    for error diffusion; 'bayer', 'bayer2'-'bayer16' or 'bluenoise' for ordered
+    serpentine: alternate the scan direction on every row (error diffusion only)
+    Unknown methods fall back to Pillow's built-in Floyd-Steinberg.
     """
-    if method == "atkinson":
-        return atkinson_dither(img)
+    if method in KERNELS or method in KERNEL_ALIASES:
+        return error_diffusion_dither(img, method=method, serpentine=serpentine)
+    if is_ordered_method(method):
+        return ordered_dither(img, method=method)
     # Default: Floyd Steinberg
     return img.convert("1", dither=Image.Dither.FLOYDSTEINBERG)
 
@@ -321,6 +706,7 @@ def save_calendar_image(
     current_weekday: int = None,
     latitude: float = None,
     longitude: float = None,
+    profile: DisplayProfile = DEFAULT_PROFILE,
 ) -> None:
     """
     Create and save the calendar image
@@ -331,71 +717,111 @@ def save_calendar_image(
         current_weekday=current_weekday,
         latitude=latitude,
         longitude=longitude,
+        profile=profile,
     )
     img.save(output_path)
 
 
+def save_preview_async(img: Image.Image, output_path: str) -> threading.Thread:
+    """
+    Save a preview PNG on a background thread so encoding and disk I/O stay
+    off the display update path. The thread is not a daemon, so the process
+    still waits for the file to be written before exiting.
+    """
+
+    def write_preview():
+        try:
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            img.save(output_path)
+        except Exception as e:
+            print(f"Error saving preview image: {e}")
+
+    thread = threading.Thread(target=write_preview, name="calendar-preview")
+    thread.start()
+    return thread
+
+
+def render_calendar_frame(
+    events: List[Dict],
+    dithering: str = "atkinson",
+    current_weekday: int = None,
+    latitude: float = None,
+    longitude: float = None,
+    preview_path: str = None,
+    profile: DisplayProfile = DEFAULT_PROFILE,
+) -> bytearray:
+    """
+    Render the calendar straight to the profile's packed EPD framebuffer,
+    without encoding and re-decoding a PNG in between.
+    If preview_path is given, a PNG preview is also written asynchronously.
+    """
+    frame = create_weekly_calendar_frame(
+        events,
+        dithering=dithering,
+        current_weekday=current_weekday,
+        latitude=latitude,
+        longitude=longitude,
+        profile=profile,
+    )
+    if preview_path:
+        save_preview_async(frame_image(frame, profile), preview_path)
+    return to_panel_frame(frame, profile)
+
+
 def get_weekly_image(photos_folder="./photos", week_number: int = None) -> Image.Image:
+    """
+    Opens the deterministic image for the current week (see get_weekly_image_path).
+    """
+    return Image.open(get_weekly_image_path(photos_folder, week_number))
+
+
+def get_weekly_image_path(photos_folder="./photos", week_number: int = None) -> str:
     """
     Returns a deterministic image filename based on the current week.
     Ensures no image repeats until all images have been used.
     Optionally, pass in a week_number to select the image for that week.
+    The folder listing and photo order come from its PhotoIndex manifest.
     """
-    # Get all image files from the photos folder
-    try:
-        all_files = os.listdir(photos_folder)
-        image_extensions = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tiff"}
-        images = [
-            f for f in all_files if os.path.splitext(f.lower())[1] in image_extensions
-        ]
-
-        if not images:
-            raise ValueError("No image files found in the photos folder")
-
-        # Sort for consistency across runs
-        images.sort()
+    if week_number is None:
+        week_number = current_week_number()
+    return PhotoIndex.for_folder(photos_folder).photo_for_week(week_number)
 
-    except FileNotFoundError:
-        raise FileNotFoundError(f"Photos folder '{photos_folder}' not found")
 
-    # Calculate the current week number since Unix epoch
+def current_week_number() -> int:
+    """
+    Return the number of whole weeks since the first Monday after the Unix epoch.
+    """
     # Using Monday as the start of the week for consistency
     epoch_start = datetime(1970, 1, 5)  # First Monday after Unix epoch
+    days_since_epoch = (datetime.now() - epoch_start).days
+    return days_since_epoch // 7
+
+
+def prewarm_photo_layers(
+    variants: List[tuple], week_number: int = None, photos_folder="./photos"
+) -> str:
+    """
+    Dither a week's photo (next week's by default) into the photo caches ahead
+    of time, as both the weekday overlay and the full-frame weekend image for
+    each (profile, dithering method) variant, so the first run of that week
+    only composites.
+    Returns the photo's path.
+    """
     if week_number is None:
-        now = datetime.now()
-        days_since_epoch = (now - epoch_start).days
-        week_number = days_since_epoch // 7
-
-    # Create a deterministic seed based on week number
-    seed_string = f"week_{week_number}"
-    hash_object = hashlib.md5(seed_string.encode())
-    hash_hex = hash_object.hexdigest()
-
-    # Convert hash to integer for indexing
-    int(hash_hex, 16)
-
-    # Calculate cycle position to ensure no repeats within a full cycle
-    num_images = len(images)
-    cycle_number = week_number // num_images
-    week_in_cycle = week_number % num_images
-
-    # Use hash to create pseudo-random order within each cycle
-    cycle_seed = f"cycle_{cycle_number}"
-    cycle_hash = hashlib.md5(cycle_seed.encode()).hexdigest()
-    int(cycle_hash, 16)
-
-    # Generate a pseudo-random permutation for this cycle
-    indices = list(range(num_images))
-
-    # Simple Fisher-Yates shuffle using our deterministic seed
-    for i in range(num_images - 1, 0, -1):
-        # Generate pseudo-random number for this position
-        pos_seed = f"{cycle_seed}_{i}"
-        pos_hash = hashlib.md5(pos_seed.encode()).hexdigest()
-        j = int(pos_hash, 16) % (i + 1)
-        indices[i], indices[j] = indices[j], indices[i]
-
-    # Select the image for this week
-    selected_index = indices[week_in_cycle]
-
-    return Image.open(os.path.join(photos_folder, images[selected_index]))
+        week_number = current_week_number() + 1
+    photo_path = get_weekly_image_path(photos_folder, week_number)
+    for profile, dithering in dict.fromkeys(variants):
+        for is_weekday in (True, False):
+            start = time.perf_counter()
+            get_dithered_photo(
+                photo_path,
+                is_weekday=is_weekday,
+                dithering=dithering,
+                profile=profile,
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"Prewarmed {'weekday' if is_weekday else 'weekend'} {dithering} "
+                f"{profile.slug} layer for {photo_path} in {elapsed:.2f}s"
+            )
+    return photo_path
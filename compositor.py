@@ -0,0 +1,59 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Frames here are packed EPD framebuffers (see image_to_esp.pack_image): one
+# bit per pixel, MSB first, 1 = black, rows of width / 8 bytes. Compositing
+# works directly on those bytes, so for the default panel a result needs no
+# further conversion; other display profiles are converted once at the end
+# (see display_profile.to_panel_frame).
+
+
+def to_plane(frame, width: int, height: int) -> np.ndarray:
+    """
+    View a packed frame as a (height, width / 8) array of bytes.
+    """
+    if width % 8:
+        raise ValueError(f"Frame width {width} is not a multiple of 8")
+    return np.frombuffer(bytes(frame), dtype=np.uint8).reshape(height, width // 8)
+
+
+def place_plane(
+    frame, frame_width: int, frame_height: int, width: int, height: int, top: int
+) -> np.ndarray:
+    """
+    Place a packed frame_width x frame_height image at row top of an otherwise
+    white width x height plane. The image must span the full width.
+    """
+    if frame_width != width or top + frame_height > height:
+        raise ValueError("Image does not fit the plane")
+    plane = np.zeros((height, width // 8), dtype=np.uint8)
+    plane[top : top + frame_height] = to_plane(frame, frame_width, frame_height)
+    return plane
+
+
+@lru_cache(maxsize=64)
+def column_mask(
+    width: int, height: int, top: int, bottom: int, right: int
+) -> np.ndarray:
+    """
+    Return a packed plane whose bits are set for columns [0, right) of rows
+    [top, bottom). right need not fall on a byte boundary.
+    """
+    row = np.zeros(width // 8, dtype=np.uint8)
+    right = max(0, min(right, width))
+    row[: right // 8] = 0xFF
+    if right % 8:
+        row[right // 8] = (0xFF << (8 - right % 8)) & 0xFF
+    mask = np.zeros((height, width // 8), dtype=np.uint8)
+    mask[top:bottom] = row
+    mask.flags.writeable = False
+    return mask
+
+
+def composite(base: np.ndarray, overlay: np.ndarray, mask: np.ndarray) -> bytearray:
+    """
+    Take overlay's bits where mask is set and base's elsewhere, bytewise.
+    Returns the packed frame.
+    """
+    return bytearray(((base & ~mask) | (overlay & mask)).tobytes())
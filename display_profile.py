@@ -0,0 +1,150 @@
+import hashlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+from PIL import Image
+
+from image_to_esp import pack_image, unpack_image
+from layer_cache import FrameStore, LayerCache
+
+CACHE_ROOT = "data/cache"
+ROTATIONS = {
+    0: None,
+    90: Image.Transpose.ROTATE_270,  # Pillow rotates counter-clockwise
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_90,
+}
+
+
+@dataclass(frozen=True)
+class DisplayProfile:
+    """
+    Geometry and framebuffer format of a kind of panel.
+
+    width, height: the panel's native resolution, as its framebuffer is laid out
+    rotation: degrees the calendar is turned clockwise onto the panel; with 90
+        or 270 it is laid out in portrait on a landscape panel (or vice versa)
+    bit_depth: bits per pixel in the framebuffer (1, or 2 for 4-gray panels)
+    bit_order: "msb" puts the first pixel of each byte in the high bits, "lsb"
+        in the low bits
+    first_hour, last_hour: the range of hours shown on the weekday grid
+    header_height: pixels above the grid for the weather and day labels
+    """
+
+    width: int = 800
+    height: int = 480
+    rotation: int = 0
+    bit_depth: int = 1
+    bit_order: str = "msb"
+    first_hour: int = 8
+    last_hour: int = 18
+    header_height: int = 50
+
+    def __post_init__(self):
+        if self.rotation not in ROTATIONS:
+            raise ValueError(f"Unsupported rotation {self.rotation}, use 0/90/180/270")
+        if self.bit_depth not in (1, 2):
+            raise ValueError(f"Unsupported bit depth {self.bit_depth}, use 1 or 2")
+        if self.bit_order not in ("msb", "lsb"):
+            raise ValueError(f"Unsupported bit order {self.bit_order!r}")
+        if not 0 <= self.first_hour < self.last_hour <= 24:
+            raise ValueError("Visible hours must satisfy 0 <= first < last <= 24")
+
+    @property
+    def canvas_size(self) -> Tuple[int, int]:
+        """
+        Size of the calendar as laid out, before rotation onto the panel.
+        """
+        if self.rotation in (90, 270):
+            return self.height, self.width
+        return self.width, self.height
+
+    @property
+    def plane_width(self) -> int:
+        """
+        Canvas width rounded up to whole bytes, the row length of the packed
+        1-bit planes the renderer composites on.
+        """
+        return -(-self.canvas_size[0] // 8) * 8
+
+    @property
+    def hours(self) -> int:
+        return self.last_hour - self.first_hour
+
+    @property
+    def day_width(self) -> float:
+        return self.canvas_size[0] / 5  # 5 days
+
+    @property
+    def hour_height(self) -> float:
+        return (self.canvas_size[1] - self.header_height) / self.hours
+
+    def photo_size(self, is_weekday: bool) -> Tuple[int, int]:
+        """
+        Size of the photo: the band below the header on weekdays, the whole
+        canvas on weekends.
+        """
+        width, height = self.canvas_size
+        return width, height - self.header_height if is_weekday else height
+
+    @property
+    def frame_bytes(self) -> int:
+        """
+        Size of one framebuffer as sent to the panel.
+        """
+        return self.width * self.height * self.bit_depth // 8
+
+    @property
+    def slug(self) -> str:
+        """
+        Short, filesystem-safe name, unique per profile.
+        """
+        digest = hashlib.sha256(repr(self).encode()).hexdigest()[:8]
+        return f"{self.width}x{self.height}-{digest}"
+
+
+DEFAULT_PROFILE = DisplayProfile()
+
+
+@dataclass(frozen=True)
+class ProfileCaches:
+    photos: LayerCache
+    layers: LayerCache
+    frames: FrameStore
+
+
+@lru_cache(maxsize=None)
+def caches_for(profile: DisplayProfile) -> ProfileCaches:
+    """
+    Return the profile's own photo, layer and frame caches, so displays of
+    different sizes never evict each other's entries.
+    """
+    root = f"{CACHE_ROOT}/{profile.slug}"
+    return ProfileCaches(
+        photos=LayerCache(f"{root}/photos"),
+        layers=LayerCache(f"{root}/layers"),
+        frames=FrameStore(f"{root}/frames"),
+    )
+
+
+def to_panel_frame(frame, profile: DisplayProfile) -> bytearray:
+    """
+    Convert a rendered frame (packed 1-bit planes of the canvas, see
+    compositor.py) to the panel's framebuffer: rotated, at its bit depth
+    and bit order.
+    """
+    width, height = profile.canvas_size
+    if (
+        profile.rotation == 0
+        and profile.bit_depth == 1
+        and profile.bit_order == "msb"
+        and profile.plane_width == width
+    ):
+        return bytearray(frame)
+    img = unpack_image(frame, profile.plane_width, height)
+    if profile.plane_width != width:
+        img = img.crop((0, 0, width, height))
+    if ROTATIONS[profile.rotation] is not None:
+        img = img.transpose(ROTATIONS[profile.rotation])
+    return pack_image(img, bit_depth=profile.bit_depth, bit_order=profile.bit_order)
@@ -0,0 +1,154 @@
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Frames that could not be delivered, retried on the next run
+OUTBOX_DIR = "data/outbox"
+# Status codes worth retrying: the device (or its Wi-Fi stack) is busy
+RETRY_STATUSES = (429, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide HTTP session. Connections are kept alive and
+    pooled per host, so the readiness probe and the upload that follows it
+    reuse one TCP connection instead of reconnecting over weak Wi-Fi.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=8, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+class DisplayTransport:
+    """
+    HTTP transport to one display with separate connect/read timeouts and
+    jittered exponential backoff between attempts.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        connect_timeout: float = 5,
+        read_timeout: float = 30,
+        attempts: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 8,
+        session: requests.Session = None,
+    ):
+        self.host = host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = session or get_session()
+
+    def url(self, path: str) -> str:
+        return f"http://{self.host}{path}"
+
+    def _sleep_before_retry(self, attempt: int) -> None:
+        # "Full jitter": uniform in [0, capped exponential]
+        time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt)))
+
+    def request(self, method: str, path: str, timeout=None, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying connection errors, timeouts and busy
+        responses. Returns the last response, or raises the last
+        requests.RequestException if no attempt got a response.
+        """
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        for attempt in range(self.attempts):
+            try:
+                response = self.session.request(
+                    method, self.url(path), timeout=timeout, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.attempts - 1:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.attempts - 1:
+                    return response
+            self._sleep_before_retry(attempt)
+
+    def post(self, path: str, data: bytes, headers: Dict[str, str] = None) -> requests.Response:
+        return self.request("POST", path, data=data, headers=headers)
+
+    def probe(self) -> Optional[requests.Response]:
+        """
+        Cheap readiness check before sending a whole frame: a HEAD request
+        with the connect timeout for both phases. Any HTTP response means the
+        device is up; returns None if it never answered.
+        """
+        try:
+            return self.request(
+                "HEAD", "/", timeout=(self.connect_timeout, self.connect_timeout)
+            )
+        except requests.RequestException:
+            return None
+
+
+def is_retryable(error: requests.RequestException) -> bool:
+    """
+    Whether a failed request is worth sending again later: the display could
+    not be reached, timed out or was busy. A 4xx reply means it rejected the
+    request itself, and resending it would only be rejected again.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return True
+    return response.status_code in RETRY_STATUSES or response.status_code >= 500
+
+
+def _outbox_path(host: str, outbox_dir: str = OUTBOX_DIR) -> Path:
+    return Path(outbox_dir) / f"{quote(host, safe='')}.bin"
+
+
+def queue_frame(host: str, frame, outbox_dir: str = OUTBOX_DIR) -> None:
+    """
+    Keep an undelivered frame on disk; a newer frame replaces an older one.
+    """
+    path = _outbox_path(host, outbox_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(bytes(frame))
+    os.replace(tmp_path, path)
+
+
+def clear_queued_frame(host: str, outbox_dir: str = OUTBOX_DIR) -> None:
+    """
+    Drop the queued frame for a host once a newer frame has been delivered
+    (or the display rejected it).
+    """
+    _outbox_path(host, outbox_dir).unlink(missing_ok=True)
+
+
+def pending_frames(outbox_dir: str = OUTBOX_DIR) -> List[Tuple[str, bytes]]:
+    """
+    Return (host, frame) for every frame waiting in the outbox.
+    """
+    outbox = Path(outbox_dir)
+    if not outbox.exists():
+        return []
+    frames = []
+    for path in sorted(outbox.glob("*.bin")):
+        with open(path, "rb") as f:
+            frames.append((unquote(path.stem), f.read()))
+    return frames
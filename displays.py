@@ -0,0 +1,153 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from display_profile import DisplayProfile
+from display_transport import DisplayTransport, pending_frames
+from image_to_esp import upload_epd_image
+
+# Registry of panels to drive; without it, the single original display is used
+DISPLAYS_PATH = "displays.json"
+DEFAULT_HOST = "192.168.1.159"
+
+
+@dataclass
+class Display:
+    """
+    One e-paper panel and how to reach it.
+    The panel geometry and framebuffer fields are those of DisplayProfile.
+    """
+
+    name: str
+    host: str
+    width: int = 800
+    height: int = 480
+    rotation: int = 0
+    bit_depth: int = 1
+    bit_order: str = "msb"
+    first_hour: int = 8
+    last_hour: int = 18
+    header_height: int = 50
+    dithering: str = "atkinson"
+    connect_timeout: float = 5
+    read_timeout: float = 30
+
+    @property
+    def profile(self) -> DisplayProfile:
+        return DisplayProfile(
+            width=self.width,
+            height=self.height,
+            rotation=self.rotation,
+            bit_depth=self.bit_depth,
+            bit_order=self.bit_order,
+            first_hour=self.first_hour,
+            last_hour=self.last_hour,
+            header_height=self.header_height,
+        )
+
+    @property
+    def frame_key(self) -> Tuple[DisplayProfile, str]:
+        """
+        Displays with the same profile and dithering are sent the same
+        rendered frame.
+        """
+        return (self.profile, self.dithering)
+
+
+@dataclass
+class UploadResult:
+    display: Display
+    ok: bool
+    seconds: float
+
+
+def load_displays(path: str = DISPLAYS_PATH) -> List[Display]:
+    """
+    Load the display registry, a JSON file of the form
+    {"displays": [{"name": "office", "host": "192.168.1.159", ...}]}.
+    Falls back to the single default display if the file does not exist.
+    """
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return [Display(name="default", host=DEFAULT_HOST)]
+
+    displays = [Display(**entry) for entry in config.get("displays", [])]
+    if not displays:
+        raise ValueError(f"No displays configured in {path}")
+    return displays
+
+
+def _upload(display: Display, frame, partial: bool) -> UploadResult:
+    start = time.perf_counter()
+    transport = DisplayTransport(
+        display.host,
+        connect_timeout=display.connect_timeout,
+        read_timeout=display.read_timeout,
+    )
+    ok = upload_epd_image(
+        display.host,
+        frame,
+        display.width,
+        display.height,
+        partial=partial,
+        transport=transport,
+        show_progress=False,
+        bit_depth=display.bit_depth,
+        bit_order=display.bit_order,
+    )
+    return UploadResult(display, ok, time.perf_counter() - start)
+
+
+def push_frames(
+    displays: List[Display],
+    frames: Dict[Tuple[DisplayProfile, str], bytes],
+    partial=True,
+) -> List[UploadResult]:
+    """
+    Upload each display's frame (looked up by frame_key) to all displays
+    concurrently, so the total time tracks the slowest display rather than
+    the sum of all of them. Returns one result per display, in order.
+    """
+    if not displays:
+        return []
+    with ThreadPoolExecutor(max_workers=len(displays)) as executor:
+        futures = [
+            executor.submit(_upload, display, frames[display.frame_key], partial)
+            for display in displays
+        ]
+        return [future.result() for future in futures]
+
+
+def push_pending_frames(displays: List[Display]) -> List[UploadResult]:
+    """
+    Concurrently retry frames that earlier runs failed to deliver to any of
+    the given displays.
+    """
+    pending = dict(pending_frames())
+    waiting = [display for display in displays if display.host in pending]
+    if not waiting:
+        return []
+    with ThreadPoolExecutor(max_workers=len(waiting)) as executor:
+        futures = [
+            executor.submit(_upload, display, pending[display.host], True)
+            for display in waiting
+        ]
+        return [future.result() for future in futures]
+
+
+def print_summary(results: List[UploadResult]) -> None:
+    """
+    Print one line per display plus a total.
+    """
+    for result in results:
+        status = "✔ updated" if result.ok else "✖ failed (queued for next run)"
+        print(
+            f"{status:<32} {result.display.name} ({result.display.host}) "
+            f"in {result.seconds:.1f}s"
+        )
+    succeeded = sum(result.ok for result in results)
+    print(f"{succeeded}/{len(results)} displays updated")
@@ -0,0 +1,354 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Error diffusion kernels as (divisor, taps). Each tap is (dx, dy, weight) and
+# receives (error * weight) // divisor, clamped to 0-255 after every addition
+# so results match the original per-pixel Atkinson implementation exactly.
+KERNELS: Dict[str, Tuple[int, Tuple[Tuple[int, int, int], ...]]] = {
+    "atkinson": (
+        8,
+        ((1, 0, 1), (2, 0, 1), (-1, 1, 1), (0, 1, 1), (1, 1, 1), (0, 2, 1)),
+    ),
+    "floyd-steinberg": (
+        16,
+        ((1, 0, 7), (-1, 1, 3), (0, 1, 5), (1, 1, 1)),
+    ),
+    "stucki": (
+        42,
+        (
+            (1, 0, 8), (2, 0, 4),
+            (-2, 1, 2), (-1, 1, 4), (0, 1, 8), (1, 1, 4), (2, 1, 2),
+            (-2, 2, 1), (-1, 2, 2), (0, 2, 4), (1, 2, 2), (2, 2, 1),
+        ),
+    ),
+    "burkes": (
+        32,
+        (
+            (1, 0, 8), (2, 0, 4),
+            (-2, 1, 2), (-1, 1, 4), (0, 1, 8), (1, 1, 4), (2, 1, 2),
+        ),
+    ),
+    "sierra": (
+        32,
+        (
+            (1, 0, 5), (2, 0, 3),
+            (-2, 1, 2), (-1, 1, 4), (0, 1, 5), (1, 1, 4), (2, 1, 2),
+            (-1, 2, 2), (0, 2, 3), (1, 2, 2),
+        ),
+    ),
+    "jarvis-judice-ninke": (
+        48,
+        (
+            (1, 0, 7), (2, 0, 5),
+            (-2, 1, 3), (-1, 1, 5), (0, 1, 7), (1, 1, 5), (2, 1, 3),
+            (-2, 2, 1), (-1, 2, 3), (0, 2, 5), (1, 2, 3), (2, 2, 1),
+        ),
+    ),
+}
+
+KERNEL_ALIASES = {
+    "floyd": "floyd-steinberg",
+    "jjn": "jarvis-judice-ninke",
+}
+
+
+def get_kernel(method: str) -> Tuple[int, Tuple[Tuple[int, int, int], ...]]:
+    """
+    Look up an error diffusion kernel by name or alias.
+    Raises ValueError for unknown kernels.
+    """
+    name = KERNEL_ALIASES.get(method, method)
+    if name not in KERNELS:
+        raise ValueError(
+            f"Unknown dithering kernel '{method}'. "
+            f"Available: {', '.join(sorted(KERNELS))}"
+        )
+    return KERNELS[name]
+
+
+def _ordered_taps(taps) -> List[Tuple[int, int, int]]:
+    """
+    Sort taps in the order a target pixel receives them during a raster scan:
+    sources from earlier rows first, then sources further left within a row.
+    """
+    return sorted(taps, key=lambda tap: (-tap[1], -tap[0]))
+
+
+def _wavefront_slope(taps) -> int:
+    """
+    Find the smallest k such that processing pixels along the diagonals
+    x + k * y = t visits every source of a pixel before the pixel itself, and
+    in the same order a raster scan would (needed because of clamping).
+    """
+    ordered = _ordered_taps(taps)
+    for k in range(1, 256):
+        delays = [dx + k * dy for dx, dy, _ in ordered]
+        if min(delays) > 0 and all(a >= b for a, b in zip(delays, delays[1:])):
+            return k
+    raise ValueError("Kernel cannot be scheduled as a wavefront")
+
+
+def _diffuse_wavefront(pixels: np.ndarray, divisor: int, taps) -> np.ndarray:
+    """
+    Raster-order error diffusion vectorized along anti-diagonals.
+
+    Pixels are stored skewed, as skewed[x + k * y, y], so every diagonal is a
+    contiguous row and every tap target is a contiguous slice of a later row.
+    Cells that do not map back to a real pixel only ever absorb error.
+    """
+    h, w = pixels.shape
+    taps = _ordered_taps(taps)
+    k = _wavefront_slope(taps)
+    max_dy = max(dy for _, dy, _ in taps)
+    max_delay = max(dx + k * dy for dx, dy, _ in taps)
+    waves = w + k * (h - 1)
+
+    skewed = np.zeros((waves + max_delay, h + max_dy), dtype=np.int32)
+    for y in range(h):
+        skewed[k * y : k * y + w, y] = pixels[y]
+
+    # Taps sharing a dy land on consecutive diagonals at the same column
+    # offset, so each row of the kernel becomes one 2D block update. Rows are
+    # applied bottom-up, which is raster order for cells hit twice in a wave.
+    blocks = []
+    for dy in sorted({dy for _, dy, _ in taps}, reverse=True):
+        row = {dx: weight for dx, tap_dy, weight in taps if tap_dy == dy}
+        dxs = range(min(row), max(row) + 1)
+        weights = np.array([[row.get(dx, 0)] for dx in dxs], dtype=np.int32)
+        uniform = int(weights[0, 0]) if (weights == weights[0, 0]).all() else None
+        blocks.append((dxs[0] + k * dy, len(dxs), dy, weights, uniform))
+
+    for t in range(waves):
+        y0 = max(0, -((w - 1 - t) // k))
+        y1 = min(h - 1, t // k) + 1
+
+        wave = skewed[t, y0:y1]
+        new = np.where(wave < 128, 0, 255)
+        err = wave - new
+        wave[...] = new
+
+        for delay, length, dy, weights, uniform in blocks:
+            if uniform is None:
+                contribution = (err * weights) // divisor
+            elif uniform == 1:
+                contribution = err // divisor
+            else:
+                contribution = (err * uniform) // divisor
+            target = skewed[t + delay : t + delay + length, y0 + dy : y1 + dy]
+            target += contribution
+            np.maximum(target, 0, out=target)
+            np.minimum(target, 255, out=target)
+
+    result = np.empty((h, w), dtype=np.uint8)
+    for y in range(h):
+        result[y] = skewed[k * y : k * y + w, y]
+    return result
+
+
+def _diffuse_serpentine(pixels: np.ndarray, divisor: int, taps) -> np.ndarray:
+    """
+    Error diffusion that alternates scan direction on every row.
+
+    Reversing direction makes each row depend on the whole previous row, so
+    the scan within a row is serial; spreading a finished row's error to the
+    rows below is vectorized.
+    """
+    h, w = pixels.shape
+    taps = _ordered_taps(taps)
+    pad = max(abs(dx) for dx, _, _ in taps)
+    max_dy = max(dy for _, dy, _ in taps)
+    row_taps = [(dx, weight) for dx, dy, weight in taps if dy == 0]
+    down_taps = [(dx, dy, weight) for dx, dy, weight in taps if dy > 0]
+
+    buf = np.zeros((h + max_dy, w + 2 * pad), dtype=np.int32)
+    buf[:h, pad : pad + w] = pixels
+
+    for y in range(h):
+        direction = 1 if y % 2 == 0 else -1
+        # Scan-ordered copy of the row with padding on both ends
+        scan = buf[y, ::direction].tolist()
+        err = [0] * len(scan)
+        for i in range(pad, pad + w):
+            old = scan[i]
+            new = 0 if old < 128 else 255
+            scan[i] = new
+            e = old - new
+            err[i] = e
+            for dx, weight in row_taps:
+                value = scan[i + dx] + (e * weight) // divisor
+                scan[i + dx] = 0 if value < 0 else 255 if value > 255 else value
+        buf[y, ::direction] = scan
+
+        err = np.array(err[::direction], dtype=np.int32)
+        for dx, dy, weight in down_taps:
+            contribution = (err * weight) // divisor
+            shift = dx * direction
+            target = buf[y + dy, max(0, shift) : buf.shape[1] + min(0, shift)]
+            source = contribution[max(0, -shift) : buf.shape[1] - max(0, shift)]
+            target += source
+            np.clip(target, 0, 255, out=target)
+
+    return buf[:h, pad : pad + w].astype(np.uint8)
+
+
+def error_diffusion_dither(
+    img: Image.Image, method: str = "atkinson", serpentine: bool = False
+) -> Image.Image:
+    """
+    Convert the image to black and white using error diffusion.
+    method: any name in KERNELS (or KERNEL_ALIASES)
+    serpentine: alternate scan direction on every row
+    """
+    divisor, taps = get_kernel(method)
+    pixels = np.asarray(img.convert("L"), dtype=np.int32)
+    if serpentine:
+        result = _diffuse_serpentine(pixels, divisor, taps)
+    else:
+        result = _diffuse_wavefront(pixels, divisor, taps)
+    return Image.fromarray(result).convert("1", dither=Image.Dither.NONE)
+
+
+BAYER_SIZES = (2, 4, 8, 16)
+BLUE_NOISE_SIZE = 64
+BLUE_NOISE_CACHE_DIR = "data/cache"
+
+
+def bayer_matrix(size: int) -> np.ndarray:
+    """
+    Return the size x size Bayer index matrix (values 0 .. size*size - 1).
+    """
+    if size not in BAYER_SIZES:
+        raise ValueError(f"Bayer matrix size must be one of {BAYER_SIZES}")
+    matrix = np.zeros((1, 1), dtype=np.int32)
+    while matrix.shape[0] < size:
+        matrix = np.block(
+            [[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]]
+        )
+    return matrix
+
+
+def _generate_blue_noise(size: int, sigma: float = 1.5, seed: int = 0) -> np.ndarray:
+    """
+    Generate a size x size blue-noise rank matrix with the void-and-cluster
+    method (Ulichney 1993), using a toroidal Gaussian energy filter.
+    """
+    n = size * size
+    # Energy a single point contributes to every cell, with wraparound distances
+    coords = np.minimum(np.arange(size), size - np.arange(size))
+    kernel = np.exp(-(coords[:, None] ** 2 + coords[None, :] ** 2) / (2 * sigma**2))
+
+    def splat(energy, index, sign):
+        y, x = divmod(index, size)
+        energy += sign * np.roll(kernel, (y, x), axis=(0, 1)).reshape(-1)
+
+    rng = np.random.default_rng(seed)
+    pattern = np.zeros(n, dtype=bool)
+    pattern[rng.choice(n, n // 10, replace=False)] = True
+    energy = np.zeros(n)
+    for index in np.flatnonzero(pattern):
+        splat(energy, index, 1)
+
+    # Phase 0: move points from the tightest cluster to the largest void
+    # until the initial pattern is evenly distributed
+    while True:
+        cluster = int(np.argmax(np.where(pattern, energy, -np.inf)))
+        pattern[cluster] = False
+        splat(energy, cluster, -1)
+        void = int(np.argmin(np.where(pattern, np.inf, energy)))
+        if void == cluster:
+            pattern[cluster] = True
+            splat(energy, cluster, 1)
+            break
+        pattern[void] = True
+        splat(energy, void, 1)
+
+    ranks = np.zeros(n, dtype=np.int32)
+    initial_pattern = pattern.copy()
+    initial_energy = energy.copy()
+    ones = int(pattern.sum())
+
+    # Phase 1: rank the initial points by removing tightest clusters
+    for rank in range(ones - 1, -1, -1):
+        cluster = int(np.argmax(np.where(pattern, energy, -np.inf)))
+        pattern[cluster] = False
+        splat(energy, cluster, -1)
+        ranks[cluster] = rank
+
+    # Phase 2: fill the remaining cells into the largest voids
+    pattern, energy = initial_pattern, initial_energy
+    for rank in range(ones, n):
+        void = int(np.argmin(np.where(pattern, np.inf, energy)))
+        pattern[void] = True
+        splat(energy, void, 1)
+        ranks[void] = rank
+
+    return ranks.reshape(size, size)
+
+
+@lru_cache(maxsize=None)
+def blue_noise_mask(size: int = BLUE_NOISE_SIZE) -> np.ndarray:
+    """
+    Return the blue-noise rank matrix, generating it at most once: it is
+    memoized per process and saved under BLUE_NOISE_CACHE_DIR between runs.
+    """
+    cache_path = Path(BLUE_NOISE_CACHE_DIR) / f"bluenoise-{size}.npy"
+    try:
+        mask = np.load(cache_path)
+        if mask.shape == (size, size):
+            return mask
+    except (OSError, ValueError):
+        pass
+
+    mask = _generate_blue_noise(size)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(cache_path, mask)
+    except OSError as e:
+        print(f"Error caching blue-noise mask: {e}")
+    return mask
+
+
+def is_ordered_method(method: str) -> bool:
+    """
+    Return True if method names a threshold-matrix (ordered) dither:
+    "bayer", "bluenoise" or "bayer<n>" for n in BAYER_SIZES.
+    """
+    return method in ("bayer", "bluenoise") or method in {
+        f"bayer{size}" for size in BAYER_SIZES
+    }
+
+
+@lru_cache(maxsize=None)
+def _threshold_matrix(method: str) -> np.ndarray:
+    """
+    Return the threshold matrix for an ordered method, scaled to 0-255.
+    'bayer' is 8x8; 'bayer2' through 'bayer16' pick the size explicitly.
+    """
+    if method == "bluenoise":
+        ranks = blue_noise_mask()
+    elif method == "bayer":
+        ranks = bayer_matrix(8)
+    else:
+        ranks = bayer_matrix(int(method[5:]))
+    return (ranks + 0.5) * (255.0 / ranks.size)
+
+
+def ordered_dither(img: Image.Image, method: str = "bayer") -> Image.Image:
+    """
+    Convert the image to black and white by comparing every pixel against a
+    tiled threshold matrix. There is no error propagation, so the whole image
+    is a single vectorized comparison.
+    method: 'bayer' (8x8), 'bayer2', 'bayer4', 'bayer8', 'bayer16' or 'bluenoise'
+    """
+    if not is_ordered_method(method):
+        raise ValueError(f"Unknown ordered dithering method '{method}'")
+    thresholds = _threshold_matrix(method)
+    pixels = np.asarray(img.convert("L"))
+    h, w = pixels.shape
+    size = thresholds.shape[0]
+    tiled = np.tile(thresholds, (-(-h // size), -(-w // size)))[:h, :w]
+    return Image.fromarray(pixels > tiled).convert("1")
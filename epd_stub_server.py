@@ -0,0 +1,181 @@
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+from image_to_esp import (
+    ENCODINGS_HEADER,
+    apply_partial_update,
+    packbits_decode,
+    unpack_image,
+)
+
+
+class StubDisplay:
+    """
+    In-memory stand-in for the ESP32 display: holds the current packed frame
+    and records (method, path) for every request it has handled.
+    """
+
+    def __init__(
+        self,
+        width=800,
+        height=480,
+        partial=True,
+        output_path=None,
+        packbits=True,
+        fail_requests=0,
+        delay=0,
+    ):
+        self.width = width
+        self.height = height
+        self.partial = partial
+        self.packbits = packbits
+        # Answer this many upcoming requests with 503, to exercise retries
+        self.fail_requests = fail_requests
+        # Seconds to wait before answering a POST, to mimic a slow panel
+        self.delay = delay
+        self.output_path = output_path
+        self.frame = bytearray(width * height // 8)
+        self.lock = threading.Lock()
+        self.requests = []
+
+    def to_image(self) -> Image.Image:
+        """
+        Return the current frame as a 1-bit image.
+        """
+        return unpack_image(self.frame, self.width, self.height)
+
+    def _refresh(self):
+        if self.output_path:
+            self.to_image().save(self.output_path)
+
+
+def make_handler(display: StubDisplay):
+    """
+    Build a request handler implementing the endpoints in PROTOCOL.md.
+    """
+
+    class StubDisplayHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 so clients can keep the connection alive between requests
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status, message=""):
+            body = message.encode()
+            self.send_response(status)
+            if display.packbits:
+                self.send_header(ENCODINGS_HEADER, "packbits")
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def _should_fail(self):
+            with display.lock:
+                display.requests.append((self.command, self.path))
+                if display.fail_requests > 0:
+                    display.fail_requests -= 1
+                    return True
+            return False
+
+        def do_HEAD(self):
+            if self._should_fail():
+                self._reply(503, "busy")
+                return
+            self._reply(200)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if self._should_fail():
+                self._reply(503, "busy")
+                return
+            time.sleep(display.delay)
+            encoding = self.headers.get("Content-Encoding", "").lower()
+            if encoding == "packbits" and display.packbits:
+                try:
+                    body = packbits_decode(body)
+                except ValueError as e:
+                    self._reply(400, str(e))
+                    return
+            elif encoding:
+                self._reply(415, "unsupported encoding")
+                return
+            with display.lock:
+                if self.path == "/image":
+                    if len(body) != len(display.frame):
+                        self._reply(400, "bad frame size")
+                        return
+                    display.frame[:] = body
+                elif self.path == "/image/partial" and display.partial:
+                    try:
+                        apply_partial_update(
+                            display.frame, body, display.width, display.height
+                        )
+                    except (ValueError, IndexError) as e:
+                        self._reply(400, str(e))
+                        return
+                else:
+                    self._reply(404, "not found")
+                    return
+                display._refresh()
+            self._reply(200, "OK")
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubDisplayHandler
+
+
+def start_stub_server(display: StubDisplay, host="127.0.0.1", port=0):
+    """
+    Start a stub display server on a background thread.
+    Returns the server; its address is server.server_address.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(display))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a local stand-in for the ESP32 e-paper display"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument(
+        "--no-partial",
+        action="store_true",
+        help="Reject /image/partial like older firmware does",
+    )
+    parser.add_argument(
+        "--no-packbits",
+        action="store_true",
+        help="Do not advertise or accept PackBits-compressed bodies",
+    )
+    parser.add_argument(
+        "--output",
+        default="data/stub_display.png",
+        help="Where to write the currently displayed frame",
+    )
+    args = parser.parse_args()
+
+    display = StubDisplay(
+        args.width,
+        args.height,
+        partial=not args.no_partial,
+        output_path=args.output,
+        packbits=not args.no_packbits,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(display))
+    print(f"Stub display listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,163 @@
+import argparse
+import heapq
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+# Default visible hours of the weekday grid (8am - 6pm), see DisplayProfile
+FIRST_HOUR = 8
+LAST_HOUR = 18
+
+
+@dataclass
+class EventBox:
+    """
+    Where one event is drawn: its rectangle and the column it was given
+    within its cluster of mutually overlapping events.
+    """
+
+    event: Dict
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    start_hour: float
+    end_hour: float
+    column: int
+    columns: int
+
+
+def assign_columns(intervals: List[Tuple[float, float]]) -> List[Tuple[int, int]]:
+    """
+    Assign each (start, end) interval the lowest column free at its start,
+    sweeping in start order with heaps of running and released columns, so
+    the whole day takes O(n log n). Intervals that touch end-to-start do not
+    overlap. Returns (column, columns) per interval in input order, where
+    columns is the number of columns its overlap cluster needs.
+    """
+    order = sorted(range(len(intervals)), key=lambda i: intervals[i][0])
+    columns = [0] * len(intervals)
+    widths = [1] * len(intervals)
+    running = []  # (end, column) of events still in progress
+    free = []  # columns released within the current cluster
+    used = 0  # columns opened by the current cluster
+    cluster = []
+
+    for i in order:
+        start, end = intervals[i]
+        while running and running[0][0] <= start:
+            heapq.heappush(free, heapq.heappop(running)[1])
+        if not running and cluster:
+            # Nothing overlaps this event: the previous cluster is complete
+            for j in cluster:
+                widths[j] = used
+            cluster, free, used = [], [], 0
+
+        if free:
+            column = heapq.heappop(free)
+        else:
+            column = used
+            used += 1
+        heapq.heappush(running, (end, column))
+        columns[i] = column
+        cluster.append(i)
+
+    for j in cluster:
+        widths[j] = used
+    return list(zip(columns, widths))
+
+
+def layout_day(
+    events: List[Dict],
+    x: float,
+    width: float,
+    top: float,
+    hour_height: float,
+    first_hour: int = FIRST_HOUR,
+    last_hour: int = LAST_HOUR,
+) -> List[EventBox]:
+    """
+    Lay out one day's events side by side in a column of the grid: events
+    are clipped to the visible hours [first_hour, last_hour), and overlapping
+    events split the day's width into equal columns instead of being stacked
+    on top of each other.
+    """
+    hours = []
+    for event in events:
+        start_hour = event["start"].hour + event["start"].minute / 60
+        end_hour = event["end"].hour + event["end"].minute / 60
+        # Clip to visible hours
+        hours.append(
+            (
+                max(first_hour, min(last_hour, start_hour)),
+                max(first_hour, min(last_hour, end_hour)),
+            )
+        )
+
+    boxes = []
+    for event, (start_hour, end_hour), (column, columns) in zip(
+        events, hours, assign_columns(hours)
+    ):
+        column_width = width / columns
+        x1 = x + column * column_width
+        boxes.append(
+            EventBox(
+                event=event,
+                x1=x1,
+                y1=top + (start_hour - first_hour) * hour_height,
+                x2=x1 + column_width,
+                y2=top + (end_hour - first_hour) * hour_height,
+                start_hour=start_hour,
+                end_hour=end_hour,
+                column=column,
+                columns=columns,
+            )
+        )
+    return boxes
+
+
+def synthetic_day(count: int, seed: int = 0) -> List[Dict]:
+    """
+    Build a busy day of random 15-180 minute events between 6am and 8pm.
+    """
+    rng = random.Random(seed)
+    day = datetime(2024, 1, 1)
+    events = []
+    for i in range(count):
+        start = day + timedelta(minutes=rng.randrange(6 * 60, 20 * 60, 5))
+        duration = timedelta(minutes=rng.choice([15, 30, 45, 60, 90, 120, 180]))
+        events.append({"summary": f"Event {i}", "start": start, "end": start + duration})
+    return events
+
+
+def benchmark(counts=(10, 100, 500, 2000), repeat: int = 5) -> None:
+    """
+    Print the best-of-repeat time to lay out synthetic days of each size.
+    """
+    for count in counts:
+        events = sorted(synthetic_day(count), key=lambda e: e["start"])
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            boxes = layout_day(events, 0, 160, 50, 43)
+            best = min(best, time.perf_counter() - start)
+        columns = max(box.columns for box in boxes)
+        print(f"{count:>6} events: {best * 1000:8.2f} ms ({columns} columns)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the event layout on synthetic busy days"
+    )
+    parser.add_argument(
+        "counts",
+        nargs="*",
+        type=int,
+        default=[10, 100, 500, 2000],
+        help="Events per synthetic day",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.counts, args.repeat)
@@ -0,0 +1,301 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+from icalendar import Calendar
+
+from ical_feed import VOLATILE_PROPERTIES
+from ical_stream import (
+    build_calendar,
+    component_properties,
+    component_span,
+    iter_components,
+    window_dates,
+)
+
+# One SQLite index per calendar file, named after the file's absolute path
+EVENT_INDEX_DIR = "data/event_index"
+SCHEMA_VERSION = 2
+# Oldest change log entries are pruned past this many rows
+CHANGE_LOG_LIMIT = 10000
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS components (
+    uid TEXT NOT NULL,
+    recurrence_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    sequence INTEGER,
+    last_modified TEXT,
+    content_hash TEXT NOT NULL,
+    first_date TEXT,
+    last_date TEXT,
+    ical TEXT NOT NULL,
+    PRIMARY KEY (uid, recurrence_id)
+);
+CREATE INDEX IF NOT EXISTS components_range ON components (first_date, last_date);
+CREATE TABLE IF NOT EXISTS timezones (tzid TEXT PRIMARY KEY, ical TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT NOT NULL,
+    recurrence_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    first_date TEXT,
+    last_date TEXT,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class EventChange:
+    """
+    One entry of the change log: a VEVENT (or recurrence exception) that was
+    inserted, updated or deleted by a sync. first_date / last_date cover the
+    dates it spanned before and after the change (None: unbounded).
+    """
+
+    id: int
+    uid: str
+    recurrence_id: str
+    action: str
+    first_date: Optional[str]
+    last_date: Optional[str]
+
+    def intersects(self, window_start: datetime, window_end: datetime) -> bool:
+        """
+        Whether the change can affect events in [window_start, window_end).
+        """
+        first, last = (day.isoformat() for day in window_dates(window_start, window_end))
+        return (self.first_date is None or self.first_date <= last) and (
+            self.last_date is None or self.last_date >= first
+        )
+
+
+def _iso(day: Optional[date]) -> Optional[str]:
+    return day.isoformat() if day is not None else None
+
+
+def _merge_spans(old, new):
+    """
+    The union of two (first, last) ISO date spans, where None is unbounded.
+    """
+    first = None if old[0] is None or new[0] is None else min(old[0], new[0])
+    last = None if old[1] is None or new[1] is None else max(old[1], new[1])
+    return first, last
+
+
+class EventStore:
+    """
+    Persistent SQLite index of a calendar file's VEVENTs, keyed by UID and
+    RECURRENCE-ID, with the range of dates each can occur on.
+
+    sync() rereads the file only when its size or mtime changed, and then
+    only writes the components whose contents changed (ignoring DTSTAMP),
+    recording each insert, update and delete in a change log. Windows are
+    then answered from the range index without rescanning the feed.
+    """
+
+    def __init__(self, ical_path: str, index_dir: str = EVENT_INDEX_DIR):
+        self.ical_path = ical_path
+        self.path = Path(index_dir) / f"{quote(os.path.abspath(ical_path), safe='')}.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.syncs = 0
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            if self._meta("schema_version") != str(SCHEMA_VERSION):
+                self.conn.executescript(
+                    "DELETE FROM components; DELETE FROM timezones; DELETE FROM meta;"
+                )
+                self._set_meta("schema_version", str(SCHEMA_VERSION))
+
+    @classmethod
+    def for_calendar(cls, ical_path: str) -> "EventStore":
+        """
+        Return the process-wide store for a calendar file.
+        """
+        key = os.path.abspath(ical_path)
+        with _stores_lock:
+            if key not in _stores:
+                _stores[key] = cls(ical_path)
+            return _stores[key]
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def sync(self) -> List[EventChange]:
+        """
+        Bring the index up to date with the calendar file and return the
+        changes this made (empty if the file is unchanged).
+        """
+        with self.lock:
+            stat = os.stat(self.ical_path)
+            signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+            if self._meta("file_signature") == signature:
+                return []
+            self.syncs += 1
+
+            stored = {
+                (uid, recurrence_id): (content_hash, first_date, last_date, position)
+                for uid, recurrence_id, content_hash, first_date, last_date, position in self.conn.execute(
+                    "SELECT uid, recurrence_id, content_hash, first_date, last_date, position "
+                    "FROM components"
+                )
+            }
+            upserts = {}
+            timezones = {}
+            for position, (name, lines) in enumerate(iter_components(self.ical_path)):
+                props = component_properties(lines)
+                if name == "VTIMEZONE":
+                    timezones[props.get("TZID", "")] = "\r\n".join(lines)
+                    continue
+                content_hash = hashlib.sha256(
+                    "\n".join(
+                        line
+                        for line in lines
+                        if not line.upper().startswith(VOLATILE_PROPERTIES)
+                    ).encode()
+                ).hexdigest()
+                # Events without a UID are told apart by their contents
+                key = (
+                    props.get("UID") or f"sha256:{content_hash}",
+                    props.get("RECURRENCE-ID", ""),
+                )
+                # Feeds sometimes repeat a UID for distinct events; later
+                # copies are told apart by their contents too, so none is lost
+                if key in upserts:
+                    key = (f"{key[0]}#sha256:{content_hash}", key[1])
+                first, last = component_span(props)
+                try:
+                    sequence = int(props.get("SEQUENCE", "0"))
+                except ValueError:
+                    sequence = 0
+                upserts[key] = (
+                    *key,
+                    position,
+                    sequence,
+                    props.get("LAST-MODIFIED"),
+                    content_hash,
+                    _iso(first),
+                    _iso(last),
+                    "\r\n".join(lines),
+                )
+
+            now = time.time()
+            changes = []
+            rows = []
+            # Unchanged events that moved within the file keep the feed's order
+            moved = []
+            for key, row in upserts.items():
+                old = stored.pop(key, None)
+                content_hash, first, last = row[5:8]
+                if old is None:
+                    changes.append((*key, "insert", first, last, now))
+                elif old[0] != content_hash:
+                    span = _merge_spans(old[1:3], (first, last))
+                    changes.append((*key, "update", *span, now))
+                else:
+                    if old[3] != row[2]:
+                        moved.append((row[2], *key))
+                    continue
+                rows.append(row)
+            for key, (_, first, last, _) in stored.items():
+                changes.append((*key, "delete", first, last, now))
+
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO components VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self.conn.executemany(
+                    "UPDATE components SET position = ? WHERE uid = ? AND recurrence_id = ?",
+                    moved,
+                )
+                self.conn.executemany(
+                    "DELETE FROM components WHERE uid = ? AND recurrence_id = ?",
+                    list(stored),
+                )
+                self.conn.execute("DELETE FROM timezones")
+                self.conn.executemany(
+                    "INSERT INTO timezones VALUES (?, ?)", timezones.items()
+                )
+                last_id = self.last_change_id()
+                self.conn.executemany(
+                    "INSERT INTO changes (uid, recurrence_id, action, first_date, last_date, synced_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    changes,
+                )
+                synced = self.changes_since(last_id)
+                self.conn.execute(
+                    "DELETE FROM changes WHERE id <= ?",
+                    (self.last_change_id() - CHANGE_LOG_LIMIT,),
+                )
+                self._set_meta("file_signature", signature)
+            return synced
+
+    def changes_since(self, change_id: int = 0) -> List[EventChange]:
+        """
+        Return the change log entries after change_id, oldest first.
+        """
+        return [
+            EventChange(*row)
+            for row in self.conn.execute(
+                "SELECT id, uid, recurrence_id, action, first_date, last_date "
+                "FROM changes WHERE id > ? ORDER BY id",
+                (change_id,),
+            )
+        ]
+
+    def last_change_id(self) -> int:
+        row = self.conn.execute("SELECT MAX(id) FROM changes").fetchone()
+        return row[0] or 0
+
+    def calendar_between(self, window_start: datetime, window_end: datetime) -> Calendar:
+        """
+        Return a Calendar of the indexed VEVENTs that can fall within
+        [window_start, window_end), plus all timezone definitions, straight
+        from the range index.
+        """
+        first, last = (day.isoformat() for day in window_dates(window_start, window_end))
+        with self.lock:
+            timezones = [row[0] for row in self.conn.execute("SELECT ical FROM timezones")]
+            events = [
+                row[0]
+                for row in self.conn.execute(
+                    "SELECT ical FROM components "
+                    "WHERE first_date IS NULL "
+                    "OR (first_date <= ? AND (last_date IS NULL OR last_date >= ?)) "
+                    "ORDER BY position",
+                    (last, first),
+                )
+            ]
+        return build_calendar([ical.split("\r\n") for ical in timezones + events])
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of indexed components and syncs this process ran.
+        """
+        (components,) = self.conn.execute("SELECT COUNT(*) FROM components").fetchone()
+        return {
+            "components": components,
+            "syncs": self.syncs,
+            "last_change_id": self.last_change_id(),
+        }
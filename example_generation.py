@@ -1,10 +1,10 @@
 import os
 from pathlib import Path
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
 
+from assets import ASSETS
 from parse_ical import parse_calendar_events
-from calendar_image import save_calendar_image
+from calendar_image import frame_image, frame_slot, render_week_batch
 from weather import geocode_location
 
 
@@ -35,33 +35,23 @@ def generate_example_calendar(location: str = None):
 
     # no need to commit example data we can generate
     os.remove("data/example.ics")
-    save_calendar_image(
-        events,
-        "example-calendars/floyd-steinberg-calendar.png",
-        dithering="floyd",
-        latitude=latitude,
-        longitude=longitude,
+    ASSETS.preload()
+    # One batch: weather fetched once, photo dithered once per method in
+    # worker processes, then every variant composed from the shared layers
+    frames = render_week_batch(
+        events, ["floyd", "atkinson"], latitude=latitude, longitude=longitude
     )
-    save_calendar_image(
-        events,
-        "example-calendars/atkinson-calendar.png",
-        dithering="atkinson",
-        latitude=latitude,
-        longitude=longitude,
-    )
-
-    def generate_day_calendar(days):
-        save_calendar_image(
-            events,
-            f"example-calendars/day-{days}-calendar.png",
-            current_weekday=days,
-            dithering="atkinson",
-            latitude=latitude,
-            longitude=longitude,
-        )
-
-    with ThreadPoolExecutor() as executor:
-        executor.map(generate_day_calendar, range(6))
+    print(ASSETS.summary())
+    now = datetime.now()
+    today = frame_slot(now.weekday(), now.hour)
+    images = {
+        "example-calendars/floyd-steinberg-calendar.png": frames["floyd"][today],
+        "example-calendars/atkinson-calendar.png": frames["atkinson"][today],
+    }
+    for days, frame in frames["atkinson"].items():
+        images[f"example-calendars/day-{days}-calendar.png"] = frame
+    for path, frame in images.items():
+        frame_image(frame).save(path)
 
 
 def create_synthetic_example_ics():
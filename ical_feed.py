@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable
+
+import requests
+
+# HTTP validators and content hash of the last feed downloaded, so unchanged
+# feeds cost one conditional request and no parsing
+FEED_STATE_PATH = "data/calendar_feed.json"
+CHUNK_SIZE = 64 * 1024
+FETCH_TIMEOUT = 30
+# Properties that change on every export without the events changing; they
+# are left out of the feed's hash so a regenerated feed is not a new one
+VOLATILE_PROPERTIES = ("DTSTAMP",)
+_VOLATILE_PREFIXES = tuple(name.encode() for name in VOLATILE_PROPERTIES)
+
+
+@dataclass
+class FeedFetch:
+    """
+    Outcome of fetch_ical_feed. status is one of "downloaded" (new contents
+    saved), "not-modified" (the server answered 304), "identical" (same bytes
+    as last time) or "error".
+    """
+
+    ok: bool
+    changed: bool
+    status: str
+
+
+def _load_state(state_path: str, url_hash: str) -> Dict:
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+        if state.get("url") == url_hash:
+            return state
+    except (FileNotFoundError, ValueError):
+        pass
+    return {}
+
+
+def _save_state(state_path: str, state: Dict) -> None:
+    try:
+        Path(state_path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+    except OSError as e:
+        print(f"Error saving calendar feed state: {e}")
+
+
+def _hash_lines(digest, lines: Iterable[bytes]) -> None:
+    for line in lines:
+        if not line.upper().startswith(_VOLATILE_PREFIXES):
+            digest.update(line.rstrip(b"\r") + b"\n")
+
+
+def fetch_ical_feed(
+    url: str, save_path: str, state_path: str = FEED_STATE_PATH
+) -> FeedFetch:
+    """
+    Fetch an iCal feed into save_path only if it changed since the last fetch.
+    The stored ETag / Last-Modified are sent as If-None-Match /
+    If-Modified-Since, so a 304 costs one round trip. Servers that ignore
+    them still stream the body into a temporary file while it is hashed;
+    if the SHA-256 (which skips VOLATILE_PROPERTIES lines) matches the last
+    download, the existing file is kept.
+    The feed URL itself is stored only as a hash, since it is often secret.
+    """
+    url_hash = hashlib.sha256(url.encode()).hexdigest()
+    state = _load_state(state_path, url_hash) if os.path.exists(save_path) else {}
+
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    tmp_path = f"{save_path}.download"
+    try:
+        with requests.get(
+            url, headers=headers, stream=True, timeout=FETCH_TIMEOUT
+        ) as response:
+            if response.status_code == 304 and state:
+                return FeedFetch(ok=True, changed=False, status="not-modified")
+            response.raise_for_status()
+
+            Path(save_path).parent.mkdir(parents=True, exist_ok=True)
+            digest = hashlib.sha256()
+            partial_line = b""
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    lines = (partial_line + chunk).split(b"\n")
+                    partial_line = lines.pop()
+                    _hash_lines(digest, lines)
+            _hash_lines(digest, [partial_line])
+            new_state = {
+                "url": url_hash,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "sha256": digest.hexdigest(),
+            }
+    except Exception as e:
+        print(f"Error fetching iCal file: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return FeedFetch(ok=False, changed=False, status="error")
+
+    if new_state["sha256"] == state.get("sha256"):
+        os.remove(tmp_path)
+        result = FeedFetch(ok=True, changed=False, status="identical")
+    else:
+        os.replace(tmp_path, save_path)
+        result = FeedFetch(ok=True, changed=True, status="downloaded")
+    # Validators may change even when the contents do not
+    if new_state != state:
+        _save_state(state_path, new_state)
+    return result
@@ -0,0 +1,207 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from icalendar import Calendar
+
+# Components are kept when their dates fall within this much of the window,
+# since the raw dates are compared before converting to local time
+WINDOW_SLACK = timedelta(days=2)
+# Top-level components materialized from the feed: the events, and the
+# timezone definitions their TZIDs may refer to
+KEPT_COMPONENTS = ("VEVENT", "VTIMEZONE")
+
+
+def unfold_lines(f) -> Iterator[str]:
+    """
+    Yield the content lines of an iCal stream (binary file) with RFC 5545
+    line folding undone: a line starting with a space or tab continues the
+    previous one. Only one logical line is held in memory at a time.
+    """
+    current = None
+    for raw in f:
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def split_property(line: str) -> Tuple[str, str]:
+    """
+    Split a content line into its upper-cased name (without parameters) and
+    its value. Colons inside quoted parameter values are skipped.
+    """
+    if '"' not in line:
+        head, _, value = line.partition(":")
+        return head.partition(";")[0].upper(), value
+    quoted = False
+    name_end = None
+    for i, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted:
+            if char == ";" and name_end is None:
+                name_end = i
+            elif char == ":":
+                return line[: name_end if name_end is not None else i].upper(), line[i + 1 :]
+    return line.upper(), ""
+
+
+def iter_components(ical_path: str) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Stream the top-level components of a calendar file as (name, unfolded
+    lines), one component at a time. Only KEPT_COMPONENTS are yielded.
+    An END that does not match the open component is ignored, so one
+    malformed component cannot hide the rest of the feed.
+    """
+    stack = []
+    lines = []
+    with open(ical_path, "rb") as f:
+        for line in unfold_lines(f):
+            prop, value = split_property(line)
+            if prop == "BEGIN":
+                stack.append(value.strip().upper())
+                if len(stack) == 2:
+                    lines = []
+            elif prop == "END" and (not stack or stack[-1] != value.strip().upper()):
+                continue
+            keep = len(stack) >= 2 and stack[1] in KEPT_COMPONENTS
+            if keep:
+                lines.append(line)
+            if prop == "END":
+                if len(stack) == 2 and keep:
+                    yield stack[1], lines
+                    lines = []
+                stack.pop()
+
+
+def component_properties(lines: List[str]) -> Dict[str, str]:
+    """
+    The raw values of a component's own properties (not those of nested
+    components such as VALARM), by upper-cased name; the first one wins.
+    """
+    props = {}
+    depth = 0
+    for line in lines:
+        prop, value = split_property(line)
+        if prop == "BEGIN":
+            depth += 1
+        elif prop == "END":
+            depth -= 1
+        elif depth == 1:
+            props.setdefault(prop, value)
+    return props
+
+
+def raw_date(value: str) -> Optional[date]:
+    """
+    The date part of a DATE or DATE-TIME value, ignoring its time zone.
+    """
+    try:
+        return date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+    except ValueError:
+        return None
+
+
+def _count_span(rule: Dict[str, str], count: int) -> Optional[timedelta]:
+    """
+    An upper bound on how long after DTSTART a COUNT-limited rule can still
+    recur, for the simple daily and weekly rules where that is easy to bound.
+    Returns None when there is no cheap bound.
+    """
+    interval = int(rule.get("INTERVAL", "1") or 1)
+    by_parts = {key for key in rule if key.startswith("BY")}
+    if rule.get("FREQ") == "DAILY" and not by_parts:
+        return timedelta(days=count * interval)
+    if rule.get("FREQ") in ("DAILY", "WEEKLY") and by_parts <= {"BYDAY"}:
+        # At least one occurrence in every (interval) weeks
+        return timedelta(weeks=count * interval)
+    return None
+
+
+def component_span(props: Dict[str, str]) -> Tuple[Optional[date], Optional[date]]:
+    """
+    The raw dates (first, last) an event's occurrences can start on, from its
+    DTSTART, RRULE and RECURRENCE-ID (see component_properties). Exceptions
+    span the date of the occurrence they override. first is None when
+    nothing can be ruled out, last is None for open-ended series.
+    """
+    if "RECURRENCE-ID" in props:
+        # Exceptions only replace occurrences on their original date
+        original = raw_date(props["RECURRENCE-ID"])
+        return original, original
+
+    start = raw_date(props.get("DTSTART", ""))
+    if start is None:
+        return None, None
+    if "RRULE" not in props:
+        return start, start
+
+    rule = {}
+    for part in props["RRULE"].split(";"):
+        key, _, value = part.partition("=")
+        rule[key.upper()] = value
+    if "UNTIL" in rule:
+        return start, raw_date(rule["UNTIL"])
+    if "COUNT" in rule:
+        try:
+            span = _count_span(rule, int(rule["COUNT"]))
+        except ValueError:
+            return start, None
+        return start, start + span if span is not None else None
+    return start, None
+
+
+def window_dates(window_start: datetime, window_end: datetime) -> Tuple[date, date]:
+    """
+    The raw dates a component must span to possibly fall in the window.
+    """
+    return window_start.date() - WINDOW_SLACK, window_end.date() + WINDOW_SLACK
+
+
+def may_intersect(lines: List[str], window_start: datetime, window_end: datetime) -> bool:
+    """
+    Cheap test, on raw VEVENT lines, of whether the event (or the occurrence
+    it overrides) can fall within the window. Only component-level
+    DTSTART, RRULE and RECURRENCE-ID are looked at; anything that cannot be
+    ruled out is kept, so the full parser has the final say.
+    """
+    first, last = window_dates(window_start, window_end)
+    span_first, span_last = component_span(component_properties(lines))
+    if span_first is None:
+        return True
+    return span_first <= last and (span_last is None or span_last >= first)
+
+
+def build_calendar(components: List[List[str]]) -> Calendar:
+    """
+    Parse the given components' lines as one calendar.
+    """
+    kept = ["BEGIN:VCALENDAR", "VERSION:2.0"]
+    for lines in components:
+        kept.extend(lines)
+    kept.append("END:VCALENDAR")
+    return Calendar.from_ical("\r\n".join(kept) + "\r\n")
+
+
+def load_window_calendar(
+    ical_path: str, window_start: datetime, window_end: datetime
+) -> Calendar:
+    """
+    Stream a calendar file and build a Calendar of only the VEVENTs that can
+    intersect [window_start, window_end) (see may_intersect), plus the
+    timezone definitions. Memory use and parse time follow the events near
+    the window rather than the size of the whole feed.
+    """
+    return build_calendar(
+        [
+            lines
+            for name, lines in iter_components(ical_path)
+            if name == "VTIMEZONE" or may_intersect(lines, window_start, window_end)
+        ]
+    )
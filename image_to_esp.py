@@ -1,60 +1,451 @@
+import json
+import os
+import struct
+import threading
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
 import requests
 from PIL import Image
 from halo import Halo
 
+from display_transport import (
+    DisplayTransport,
+    clear_queued_frame,
+    is_retryable,
+    queue_frame,
+)
+
+# Last frame each display acknowledged, used to compute partial updates
+LAST_FRAME_DIR = "data/last_frames"
+# Dirty regions closer than this (rows / bytes) are merged into one rectangle
+PARTIAL_ROW_GAP = 2
+PARTIAL_COLUMN_GAP = 4
+# Send a full frame instead when the partial body would be larger than this
+PARTIAL_MAX_RATIO = 0.75
+# Responses meaning the device has no /image/partial endpoint
+PARTIAL_UNSUPPORTED_STATUSES = (404, 405, 501)
+# Encodings each display advertised via the X-EPD-Encodings response header
+CAPABILITIES_PATH = "data/display_capabilities.json"
+ENCODINGS_HEADER = "X-EPD-Encodings"
+# Serializes read-modify-write of CAPABILITIES_PATH across upload threads
+_capabilities_lock = threading.Lock()
+
+# Byte-wise NOT, used to flip Pillow's mode "1" packing (1 = white) to ours (1 = black)
+_INVERT = bytes(255 - i for i in range(256))
+
+
+def pack_image(img: Image.Image, bit_depth=1, bit_order="msb") -> bytearray:
+    """
+    Packs an in-memory image into a raw bytearray, MSB first by default
+    (bit_order="lsb" puts the first pixel in the low bits instead).
+    1 bit per pixel: white (>= 128) → 0 bit, black (< 128) → 1 bit.
+    2 bits per pixel: four gray levels, white → 0 up to black → 3.
+    Pixels are packed as one row-major stream; trailing pixels that do not
+    fill a whole byte are dropped.
+    """
+    if bit_depth == 1:
+        if img.mode == "1" and img.width % 8 == 0 and bit_order == "msb":
+            # Rows are already byte-aligned, so Pillow's packing is ours inverted
+            return bytearray(img.tobytes().translate(_INVERT))
+        black = np.asarray(img.convert("L")).reshape(-1) < 128
+        packed = np.packbits(black, bitorder="big" if bit_order == "msb" else "little")
+        return bytearray(packed[: black.size // 8].tobytes())
+    if bit_depth == 2:
+        levels = (255 - np.asarray(img.convert("L"), dtype=np.uint16) + 42) // 85
+        levels = levels.reshape(-1)
+        levels = levels[: levels.size // 4 * 4].reshape(-1, 4).astype(np.uint8)
+        shifts = (6, 4, 2, 0) if bit_order == "msb" else (0, 2, 4, 6)
+        packed = np.zeros(len(levels), dtype=np.uint8)
+        for column, shift in enumerate(shifts):
+            packed |= levels[:, column] << shift
+        return bytearray(packed.tobytes())
+    raise ValueError(f"Unsupported bit depth {bit_depth}")
+
+
+def unpack_image(frame, width: int, height: int) -> Image.Image:
+    """
+    Inverse of pack_image: turn a packed frame back into a mode "1" image.
+    """
+    return Image.frombytes("1", (width, height), bytes(frame).translate(_INVERT))
+
 
-def prepare_image_data(image_path):
+def prepare_image_data(image, bit_depth=1, bit_order="msb"):
     """
-    Loads an image and converts it to a raw 1-bit packed bytearray.
-    800x480 pixels, 1 bit per pixel, MSB first. Total: 48000 bytes.
+    Converts an image to a raw packed bytearray (see pack_image).
+    image: a file path or an in-memory PIL.Image
+    800x480 pixels, 1 bit per pixel, MSB first by default. Total: 48000 bytes.
     Pixel mapping: white (>= 128) → 0 bit, black (< 128) → 1 bit.
     """
-    img = Image.open(image_path).convert("L")  # grayscale
-    pixels = img.getdata()
-    packed = bytearray(len(pixels) // 8)
-    for i in range(len(packed)):
-        byte = 0
-        for bit in range(8):
-            px = pixels[i * 8 + bit]
-            if px < 128:  # black pixel
-                byte |= 0x80 >> bit
-        packed[i] = byte
-    return packed
+    if isinstance(image, Image.Image):
+        return pack_image(image, bit_depth, bit_order)
+    with Image.open(image) as img:
+        return pack_image(img, bit_depth, bit_order)
+
+
+def dirty_rectangles(previous, current, width, height, bit_depth=1):
+    """
+    Compares two packed frames and returns the changed regions as
+    (x, y, w, h) pixel rectangles, with x and w aligned to whole bytes.
+    Dirty rows are grouped into bands (bridging gaps of up to
+    PARTIAL_ROW_GAP rows), and each band is split into runs of dirty byte
+    columns (bridging gaps of up to PARTIAL_COLUMN_GAP bytes).
+    """
+    row_bytes = width * bit_depth // 8
+    pixels_per_byte = 8 // bit_depth
+    old = np.frombuffer(bytes(previous), dtype=np.uint8).reshape(height, row_bytes)
+    new = np.frombuffer(bytes(current), dtype=np.uint8).reshape(height, row_bytes)
+    changed = old != new
+
+    rects = []
+    for y0, y1 in _runs(np.flatnonzero(changed.any(axis=1)), PARTIAL_ROW_GAP):
+        columns = np.flatnonzero(changed[y0:y1].any(axis=0))
+        for x0, x1 in _runs(columns, PARTIAL_COLUMN_GAP):
+            rects.append(
+                (x0 * pixels_per_byte, y0, (x1 - x0) * pixels_per_byte, y1 - y0)
+            )
+    return rects
+
+
+def _runs(indices, gap):
+    """
+    Groups sorted indices into half-open [start, end) runs, merging runs
+    separated by at most gap missing indices.
+    """
+    runs = []
+    for index in indices.tolist():
+        if runs and index - runs[-1][1] <= gap:
+            runs[-1][1] = index + 1
+        else:
+            runs.append([index, index + 1])
+    return [tuple(run) for run in runs]
+
+
+def encode_partial_update(frame, rects, width, bit_depth=1):
+    """
+    Encodes the given rectangles of a packed frame as a partial update body
+    (see PROTOCOL.md): a big-endian u16 rectangle count, then for each
+    rectangle a u16 x, y, w, h header followed by its packed rows.
+    """
+    row_bytes = width * bit_depth // 8
+    pixels_per_byte = 8 // bit_depth
+    pixels = np.frombuffer(bytes(frame), dtype=np.uint8).reshape(-1, row_bytes)
+    payload = bytearray(struct.pack(">H", len(rects)))
+    for x, y, w, h in rects:
+        payload += struct.pack(">HHHH", x, y, w, h)
+        payload += pixels[
+            y : y + h, x // pixels_per_byte : (x + w) // pixels_per_byte
+        ].tobytes()
+    return bytes(payload)
+
+
+def apply_partial_update(frame, payload, width, height, bit_depth=1):
+    """
+    Reference decoder for partial update bodies: writes each rectangle into
+    the packed frame (a bytearray) in place. Raises ValueError on bodies
+    that are truncated or fall outside the frame.
+    """
+    row_bytes = width * bit_depth // 8
+    pixels_per_byte = 8 // bit_depth
+    (count,) = struct.unpack_from(">H", payload, 0)
+    offset = 2
+    for _ in range(count):
+        x, y, w, h = struct.unpack_from(">HHHH", payload, offset)
+        offset += 8
+        if (
+            x % pixels_per_byte
+            or w % pixels_per_byte
+            or x + w > width
+            or y + h > height
+        ):
+            raise ValueError(f"Rectangle out of bounds: {(x, y, w, h)}")
+        rect_bytes = w // pixels_per_byte
+        if offset + rect_bytes * h > len(payload):
+            raise ValueError("Partial update body is truncated")
+        for row in range(y, y + h):
+            start = row * row_bytes + x // pixels_per_byte
+            frame[start : start + rect_bytes] = payload[offset : offset + rect_bytes]
+            offset += rect_bytes
+    if offset != len(payload):
+        raise ValueError("Partial update body has trailing bytes")
+    return frame
+
+
+def last_frame_path_for(ip_address):
+    """
+    Returns where the last frame acknowledged by a display is kept.
+    """
+    return Path(LAST_FRAME_DIR) / f"{quote(ip_address, safe='')}.bin"
+
+
+def load_last_frame(path):
+    """
+    Returns the last frame successfully sent to the display, or None.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
 
 
-def upload_epd_image(ip_address, image_path, epd_width=800, epd_height=480):
+def save_last_frame(frame, path):
+    """
+    Atomically records the frame the display is now showing.
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(bytes(frame))
+    os.replace(tmp_path, path)
+
+
+def packbits_encode(data) -> bytes:
+    """
+    Compresses bytes with PackBits run-length coding (see PROTOCOL.md).
+    Each chunk starts with a header byte n: 0-127 copies the next n + 1
+    bytes literally, 129-255 repeats the next byte 257 - n times.
+    Runs are found with NumPy, so the Python loop is per run, not per byte.
+    """
+    values = np.frombuffer(bytes(data), dtype=np.uint8)
+    if values.size == 0:
+        return b""
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(values)) + 1))
+    lengths = np.diff(np.append(starts, values.size))
+
+    raw = values.tobytes()
+    out = bytearray()
+    literal_start = None
+
+    def flush_literal(end):
+        for chunk in range(literal_start, end, 128):
+            chunk_end = min(chunk + 128, end)
+            out.append(chunk_end - chunk - 1)
+            out.extend(raw[chunk:chunk_end])
+
+    for start, length in zip(starts.tolist(), lengths.tolist()):
+        if length < 3:
+            # Short runs are cheaper inside a literal chunk
+            if literal_start is None:
+                literal_start = start
+            continue
+        if literal_start is not None:
+            flush_literal(start)
+            literal_start = None
+        while length >= 3:
+            count = min(length, 128)
+            out.append(257 - count)
+            out.append(raw[start])
+            start += count
+            length -= count
+        if length:
+            literal_start = start
+
+    if literal_start is not None:
+        flush_literal(len(raw))
+    return bytes(out)
+
+
+def packbits_decode(data) -> bytes:
+    """
+    Reference PackBits decoder, mirroring what the firmware implements.
+    Raises ValueError on truncated input.
+    """
+    data = bytes(data)
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        n = data[i]
+        i += 1
+        if n < 128:
+            if i + n + 1 > len(data):
+                raise ValueError("PackBits literal is truncated")
+            out += data[i : i + n + 1]
+            i += n + 1
+        elif n > 128:
+            if i >= len(data):
+                raise ValueError("PackBits run is truncated")
+            out += bytes([data[i]]) * (257 - n)
+            i += 1
+    return bytes(out)
+
+
+def load_display_encodings(ip_address, path=CAPABILITIES_PATH):
+    """
+    Returns the body encodings the display last advertised (empty if unknown).
+    """
+    try:
+        with open(path) as f:
+            return set(json.load(f).get(ip_address, []))
+    except (FileNotFoundError, ValueError):
+        return set()
+
+
+def save_display_encodings(ip_address, encodings, path=CAPABILITIES_PATH):
+    """
+    Records the body encodings a display advertised.
+    """
+    with _capabilities_lock:
+        try:
+            with open(path) as f:
+                capabilities = json.load(f)
+        except (FileNotFoundError, ValueError):
+            capabilities = {}
+        if set(capabilities.get(ip_address, [])) == set(encodings):
+            return
+        capabilities[ip_address] = sorted(encodings)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(capabilities, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def _parse_encodings(response):
+    header = response.headers.get(ENCODINGS_HEADER, "")
+    return {encoding.strip().lower() for encoding in header.split(",") if encoding.strip()}
+
+
+def post_frame_body(transport, path, body, encodings):
+    """
+    POSTs a frame body, PackBits-compressed if the display advertised support
+    and compression actually saves bytes. A 415 reply to a compressed body is
+    retried raw. Returns (response, encodings advertised by the reply).
+    """
+    headers = {"Content-Type": "application/octet-stream"}
+    data = bytes(body)
+    if "packbits" in encodings:
+        encoded = packbits_encode(data)
+        if len(encoded) < len(data):
+            headers["Content-Encoding"] = "packbits"
+            data = encoded
+
+    response = transport.post(path, data, headers=headers)
+    if response.status_code == 415 and "Content-Encoding" in headers:
+        del headers["Content-Encoding"]
+        response = transport.post(path, bytes(body), headers=headers)
+    return response, _parse_encodings(response)
+
+
+def upload_epd_image(
+    ip_address,
+    image,
+    epd_width=800,
+    epd_height=480,
+    partial=True,
+    last_frame_path=None,
+    compress=True,
+    transport=None,
+    show_progress=True,
+    bit_depth=1,
+    bit_order="msb",
+):
     """
     Uploads an image to the ESP32 e-Paper device.
-    Converts the image to 1-bit packed format and POSTs to /image.
+    image: a file path, an in-memory PIL.Image, or an already packed buffer
+    (bytes/bytearray/memoryview), which is sent as-is.
+    Converts the image to the panel's packed format (bit_depth bits per
+    pixel in bit_order, see pack_image) and POSTs to /image.
+    With partial=True, only the regions that differ from the last frame sent
+    are POSTed to /image/partial; devices without that endpoint get a full
+    upload instead. With compress=True, bodies are PackBits-compressed for
+    displays that advertised support in an earlier response; everything else
+    gets raw bytes. Returns True once the display has the new frame.
+    Requests go through a pooled DisplayTransport with retries; a frame that
+    still cannot be delivered is queued in the outbox for the next run,
+    unless the display rejected it outright (a 4xx reply, see is_retryable).
+    Set show_progress=False to silence the spinner (e.g. when uploading to
+    several displays at once).
     """
-    url = f"http://{ip_address}/image"
+    if transport is None:
+        transport = DisplayTransport(ip_address)
+    if last_frame_path is None:
+        last_frame_path = last_frame_path_for(ip_address)
+    url = transport.url("/image")
 
     spinner = Halo(
         text=f"Preparing image for EPD at {ip_address} ({epd_width}x{epd_height})",
         spinner="dots",
+        enabled=show_progress,
     )
     spinner.start()
 
+    image_data = None
     try:
-        image_data = prepare_image_data(image_path)
-        expected = epd_width * epd_height // 8
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image_data = image
+        else:
+            image_data = prepare_image_data(image, bit_depth, bit_order)
+        expected = epd_width * epd_height * bit_depth // 8
         if len(image_data) != expected:
             spinner.fail(f"Image data size mismatch: got {len(image_data)}, expected {expected}")
-            return
+            return False
+
+        spinner.text = f"Checking that {ip_address} is ready..."
+        probe = transport.probe()
+        if probe is None:
+            queue_frame(ip_address, image_data)
+            spinner.fail(f"Display at {ip_address} is not responding, frame queued for next run")
+            return False
+
+        encodings = set()
+        if compress:
+            encodings = _parse_encodings(probe) or load_display_encodings(ip_address)
+
+        previous = load_last_frame(last_frame_path) if partial else None
+        if (
+            previous is not None
+            and len(previous) == expected
+            and epd_width * bit_depth % 8 == 0
+        ):
+            rects = dirty_rectangles(
+                previous, image_data, epd_width, epd_height, bit_depth
+            )
+            if not rects:
+                spinner.succeed("Display already shows this frame, nothing to upload")
+                return True
+
+            payload = encode_partial_update(image_data, rects, epd_width, bit_depth)
+            if len(payload) <= expected * PARTIAL_MAX_RATIO:
+                spinner.text = (
+                    f"Uploading {len(rects)} changed region(s), "
+                    f"{len(payload)} bytes to {url}/partial..."
+                )
+                response, advertised = post_frame_body(
+                    transport, "/image/partial", payload, encodings
+                )
+                if response.status_code in PARTIAL_UNSUPPORTED_STATUSES:
+                    spinner.text = "Partial updates not supported, sending full frame..."
+                else:
+                    response.raise_for_status()
+                    save_last_frame(image_data, last_frame_path)
+                    save_display_encodings(ip_address, advertised)
+                    clear_queued_frame(ip_address)
+                    spinner.succeed(f"Partial update uploaded ({len(rects)} region(s))")
+                    return True
 
         spinner.text = f"Uploading {len(image_data)} bytes to {url}..."
-        response = requests.post(
-            url,
-            data=bytes(image_data),
-            headers={"Content-Type": "application/octet-stream"},
-            timeout=30,
-        )
+        response, advertised = post_frame_body(transport, "/image", image_data, encodings)
         response.raise_for_status()
+        save_last_frame(image_data, last_frame_path)
+        save_display_encodings(ip_address, advertised)
+        clear_queued_frame(ip_address)
         spinner.succeed("Image uploaded successfully!")
+        return True
 
     except requests.exceptions.RequestException as e:
-        spinner.fail(f"Upload failed: {e}")
+        if image_data is None:
+            spinner.fail(f"Upload failed: {e}")
+        elif is_retryable(e):
+            queue_frame(ip_address, image_data)
+            spinner.fail(f"Upload failed, frame queued for next run: {e}")
+        else:
+            # Resending a frame the display rejected would fail the same way
+            clear_queued_frame(ip_address)
+            spinner.fail(f"Display rejected the frame, not retrying: {e}")
     except FileNotFoundError:
-        spinner.fail(f"Image file not found: {image_path}")
+        spinner.fail(f"Image file not found: {image}")
     except Exception as e:
         spinner.fail(f"Error: {e}")
+    return False
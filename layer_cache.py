@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from PIL import Image
+
+# Bump when the rendering/dithering pipeline changes so stale layers are ignored
+CACHE_VERSION = 4
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Return the SHA-256 hex digest of a file's contents, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(*parts) -> str:
+    """
+    Build a content-addressed cache key from the inputs that determine a layer.
+    """
+    material = "|".join([f"v{CACHE_VERSION}"] + [repr(part) for part in parts])
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class LayerCache:
+    """
+    On-disk cache of rendered 1-bit layers, stored as PNG files named by key.
+
+    Entries unused for longer than max_age seconds are dropped, and the least
+    recently used entries are evicted once the directory exceeds max_bytes.
+    """
+
+    suffix = ".png"
+
+    def __init__(
+        self,
+        cache_dir: str = "data/cache",
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age: float = 30 * 24 * 3600,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.suffix}"
+
+    def _read(self, path: Path) -> Image.Image:
+        with Image.open(path) as cached:
+            cached.load()
+            return cached.copy()
+
+    def _write(self, path: Path, img: Image.Image) -> None:
+        img.save(path, format="PNG")
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        """
+        Return the cached layer for key, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.max_age:
+                path.unlink()
+                self.evictions += 1
+                self.misses += 1
+                return None
+            img = self._read(path)
+            # Refresh mtime so eviction is least-recently-used
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            print(f"Error reading cached layer {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return img
+
+    def put(self, key: str, img: Image.Image) -> None:
+        """
+        Store a layer under key, then enforce the size and age limits.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        # Unique temp name so concurrent writers never clobber each other
+        tmp_path = self.cache_dir / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._write(tmp_path, img)
+        os.replace(tmp_path, path)
+        self.writes += 1
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Remove expired entries and trim the cache to max_bytes.
+        Returns the number of entries removed.
+        """
+        if not self.cache_dir.exists():
+            return 0
+
+        now = time.time()
+        entries = []
+        removed = 0
+        for path in self.cache_dir.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        self.evictions += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return hit/miss/write/eviction counters for this cache.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+
+class FrameStore(LayerCache):
+    """
+    LayerCache of finished frames, kept as the packed bytes that are uploaded
+    (.bin files), so a hit is a single file read with no PNG decode or
+    repacking.
+    """
+
+    suffix = ".bin"
+
+    def _read(self, path: Path) -> bytearray:
+        with open(path, "rb") as f:
+            return bytearray(f.read())
+
+    def _write(self, path: Path, frame: Union[bytes, bytearray]) -> None:
+        with open(path, "wb") as f:
+            f.write(frame)
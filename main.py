@@ -1,12 +1,14 @@
 import os
-import requests
 import argparse
-from pathlib import Path
+import sqlite3
 from datetime import datetime
 
-from parse_ical import parse_calendar_events
-from calendar_image import save_calendar_image
-from image_to_esp import upload_epd_image
+from assets import ASSETS
+from event_store import EventStore
+from ical_feed import fetch_ical_feed
+from parse_ical import get_week_range, parse_calendar_events
+from calendar_image import prewarm_photo_layers, render_calendar_frame
+from displays import load_displays, print_summary, push_frames, push_pending_frames
 from dotenv import load_dotenv
 from example_generation import generate_example_calendar
 from weather import geocode_location
@@ -17,17 +19,7 @@ def fetch_ical_file(url: str, save_path: str) -> bool:
     Fetch iCal file from URL and save it locally
     Returns True if successful, False otherwise
     """
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-
-        Path(save_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(save_path, "wb") as f:
-            f.write(response.content)
-        return True
-    except Exception as e:
-        print(f"Error fetching iCal file: {e}")
-        return False
+    return fetch_ical_feed(url, save_path).ok
 
 
 def main(location: str = None, force_update: bool = False):
@@ -39,6 +31,8 @@ def main(location: str = None, force_update: bool = False):
             "I_CAL_ADDRESS environment variable is not set. Please set it in the .env file."
         )
 
+    displays = load_displays()
+
     # Get coordinates for location if provided
     latitude, longitude = None, None
     if location:
@@ -59,38 +53,65 @@ def main(location: str = None, force_update: bool = False):
         if not success:
             print("Failed to fetch iCal file, exiting.")
             return
-        events = parse_calendar_events("data/calendar.ics")
     else:
         print("Existing calendar file found, checking for updates...")
-        fetch_ical_file(I_CAL_ADDRESS, "data/tmp_calendar.ics")
-        old_events = parse_calendar_events("data/calendar.ics")
-        new_events = parse_calendar_events("data/tmp_calendar.ics")
-        # replace old calendar with new calendar
-        os.remove("data/calendar.ics")
-        os.rename("data/tmp_calendar.ics", "data/calendar.ics")
-        if old_events != new_events:
-            print("Calendar has changed, updating image...")
-            events = new_events
+        # Unchanged feeds (a 304, or the same contents as last time apart from
+        # DTSTAMPs) are not parsed
+        feed = fetch_ical_feed(I_CAL_ADDRESS, "data/calendar.ics")
+        # Changed feeds are indexed incrementally; only changes that can
+        # touch this week's events need a new image
+        week_start, week_end = get_week_range()
+        try:
+            changes = [
+                change
+                for change in EventStore.for_calendar("data/calendar.ics").sync()
+                if change.intersects(week_start, week_end)
+            ]
+            changed = bool(changes)
+        except sqlite3.Error as e:
+            print(f"Error updating event store: {e}")
+            changes, changed = [], feed.changed
+        if changed:
+            print(
+                f"Calendar has changed ({len(changes)} event(s) this week), updating image..."
+            )
         elif force_update:
             print("Force update requested, updating image...")
-            events = new_events
+        elif datetime.now().hour <= 7:
+            # If it's before or currently 7am, update the image to reflect that a day needs to be overwritten
+            pass
         else:
-            current_date = datetime.now()
-            if current_date.hour <= 7:
-                # If it's before or currently 7am, update the image to reflect that a day needs to be overwritten
-                events = new_events
-            else:
-                print("No changes in calendar, skipping image update.")
-                return
-    save_calendar_image(
-        events,
-        "data/calendar.png",
-        dithering="atkinson",
-        latitude=latitude,
-        longitude=longitude,
-    )
+            print(f"No changes in calendar ({feed.status}), skipping image update.")
+            # Still deliver any frame a previous run failed to send
+            results = push_pending_frames(displays)
+            if results:
+                print_summary(results)
+            return
+    events = parse_calendar_events("data/calendar.ics")
+
+    # Decode every weather icon once, before any frame needs one
+    ASSETS.preload()
+    # Render once per distinct display profile and dithering, then push to all
+    # panels at once
+    frames = {}
+    for profile, dithering in dict.fromkeys(d.frame_key for d in displays):
+        preview_path = (
+            "data/calendar.png"
+            if not frames
+            else f"data/calendar-{profile.slug}-{dithering}.png"
+        )
+        frames[(profile, dithering)] = render_calendar_frame(
+            events,
+            dithering=dithering,
+            latitude=latitude,
+            longitude=longitude,
+            preview_path=preview_path,
+            profile=profile,
+        )
     print(f"Created calendar image with {len(events)} events")
-    upload_epd_image("192.168.1.159", "data/calendar.png", 800, 480)
+    print(ASSETS.summary())
+    # A forced update always sends the full frame in case a panel was reset
+    print_summary(push_frames(displays, frames, partial=not force_update))
 
 
 if __name__ == "__main__":
@@ -112,10 +133,17 @@ if __name__ == "__main__":
         action="store_true",
         help="Force update the calendar image even if no changes are detected",
     )
+    parser.add_argument(
+        "--prewarm",
+        action="store_true",
+        help="Dither next week's photo into the cache ahead of time (e.g. on Sunday)",
+    )
 
     args = parser.parse_args()
 
     if args.examples:
         generate_example_calendar(location=args.location)
+    elif args.prewarm:
+        prewarm_photo_layers([display.frame_key for display in load_displays()])
     else:
         main(location=args.location, force_update=args.update)
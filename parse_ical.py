@@ -1,200 +1,344 @@
-from datetime import datetime, timedelta
+import sqlite3
+from datetime import date, datetime, timedelta, tzinfo
 from icalendar import Calendar
-from dateutil.rrule import rrulestr
-from typing import List, Dict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import pytz
 
+from event_store import EventStore
+from ical_stream import load_window_calendar
+from recurrence import (
+    excluded_dates,
+    occurrences_between,
+    recurrence_start,
+    rrule_string,
+)
 
-def get_week_range() -> tuple[datetime, datetime]:
+LOCAL_TZ = pytz.timezone("America/Denver")  # or your local timezone
+
+
+def week_range(day, local_tz: tzinfo = LOCAL_TZ) -> tuple[datetime, datetime]:
+    """
+    Get the start and end datetime for the week (Monday to Monday) containing
+    day, a date or datetime; aware datetimes are converted to local_tz first
+    Returns (week_start, week_end) tuple at local midnight
+    """
+    if isinstance(day, datetime):
+        if day.tzinfo is not None:
+            day = day.astimezone(local_tz)
+        day = day.date()
+    monday = day - timedelta(days=day.weekday())
+    week_start = local_tz.localize(datetime.combine(monday, datetime.min.time()))
+    week_end = local_tz.localize(
+        datetime.combine(monday + timedelta(days=7), datetime.min.time())
+    )
+    return week_start, week_end
+
+
+def get_week_range(
+    now: Optional[datetime] = None, local_tz: tzinfo = LOCAL_TZ
+) -> tuple[datetime, datetime]:
     """
     Get the start and end datetime for the current week
     Returns (week_start, week_end) tuple with timezone awareness
+    now defaults to the current time, so a fixed date can be passed instead
     """
-    local_tz = pytz.timezone("America/Denver")  # or your local timezone
-    today = datetime.now(local_tz)
-    week_start = today - timedelta(days=today.weekday())
-    week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_end = week_start + timedelta(days=7)
-    return week_start, week_end
+    if now is None:
+        now = datetime.now(local_tz)
+    return week_range(now, local_tz)
 
 
 def parse_calendar_events(ical_path: str) -> List[Dict]:
     """
     Parse iCal file and return list of events for current week
+    See CalendarEvents for querying other or several windows with one parse.
+    """
+    return CalendarEvents(ical_path).events_this_week()
+
+
+class CalendarEvents:
+    """
+    The events of a calendar file, parsed once and queried for any number of
+    windows (events_between, events_by_week).
+
+    The file is synced into its EventStore (a no-op when it has not changed)
+    and only the events the store's range index places in the span of the
+    windows asked for are parsed. A query outside that span widens it with
+    one more read; queries inside it only expand the already parsed events.
+    clock returns the current time, for events_this_week.
+    """
+
+    def __init__(
+        self,
+        ical_path: str,
+        local_tz: tzinfo = LOCAL_TZ,
+        clock: Optional[Callable[[], datetime]] = None,
+    ):
+        self.ical_path = ical_path
+        self.local_tz = local_tz
+        self.clock = clock or (lambda: datetime.now(local_tz))
+        self.span: Optional[Tuple[datetime, datetime]] = None
+        self.masters = []
+        self.exceptions = {}
+        self.parses = 0
+
+    def _load(self, window_start: datetime, window_end: datetime) -> bool:
+        """
+        Make sure the events of [window_start, window_end) are parsed.
+        Returns False if the calendar could not be read.
+        """
+        if self.span is not None:
+            if self.span[0] <= window_start and window_end <= self.span[1]:
+                return True
+            window_start = min(window_start, self.span[0])
+            window_end = max(window_end, self.span[1])
+        try:
+            store = EventStore.for_calendar(self.ical_path)
+            store.sync()
+            cal = store.calendar_between(window_start, window_end)
+        except sqlite3.Error as e:
+            print(f"Error reading event store, scanning calendar file instead: {e}")
+            try:
+                cal = load_window_calendar(self.ical_path, window_start, window_end)
+            except Exception as e:
+                print(f"Error parsing calendar file: {e}")
+                return False
+        except Exception as e:
+            print(f"Error parsing calendar file: {e}")
+            return False
+        try:
+            self.masters, self.exceptions = index_calendar_events(cal, self.local_tz)
+        except Exception as e:
+            print(f"Error parsing calendar file: {e}")
+            return False
+        self.span = (window_start, window_end)
+        self.parses += 1
+        return True
+
+    def _localize(self, value) -> datetime:
+        if not isinstance(value, datetime):
+            value = datetime.combine(value, datetime.min.time())
+        if value.tzinfo is None:
+            return self.local_tz.localize(value)
+        return value.astimezone(self.local_tz)
+
+    def events_between(self, start, end) -> List[Dict]:
+        """
+        Return the events within [start, end), sorted by start time
+        Dates and naive datetimes are taken as local time
+        """
+        start, end = self._localize(start), self._localize(end)
+        if not self._load(start, end):
+            return []
+        return expand_events(self.masters, self.exceptions, start, end, self.local_tz)
+
+    def events_by_week(self, weeks: Optional[Iterable] = None) -> Dict[date, List[Dict]]:
+        """
+        Return each week's events (see events_between), keyed by the date of
+        its Monday. weeks are dates or datetimes within the weeks wanted and
+        default to the current week; all of them are parsed in one pass.
+        """
+        if weeks is None:
+            weeks = [self.clock()]
+        ranges = [week_range(week, self.local_tz) for week in weeks]
+        if not ranges:
+            return {}
+        if not self._load(min(r[0] for r in ranges), max(r[1] for r in ranges)):
+            return {week_start.date(): [] for week_start, _ in ranges}
+        return {
+            week_start.date(): expand_events(
+                self.masters, self.exceptions, week_start, week_end, self.local_tz
+            )
+            for week_start, week_end in ranges
+        }
+
+    def events_this_week(self) -> List[Dict]:
+        """
+        Return the current week's events, by clock
+        """
+        return self.events_between(*get_week_range(self.clock(), self.local_tz))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of parsed events and how many parses this took
+        """
+        return {
+            "masters": len(self.masters),
+            "exceptions": len(self.exceptions),
+            "parses": self.parses,
+        }
+
+
+def expand_calendar_events(
+    cal: Calendar,
+    week_start: datetime,
+    week_end: datetime,
+    local_tz: tzinfo = LOCAL_TZ,
+) -> List[Dict]:
+    """
+    Return the events of a Calendar within [week_start, week_end), with
+    recurring events expanded and their exceptions applied
+    """
+    try:
+        masters, exceptions = index_calendar_events(cal, local_tz)
+    except Exception as e:
+        print(f"Error parsing calendar file: {e}")
+        return []
+    return expand_events(masters, exceptions, week_start, week_end, local_tz)
+
+
+def index_calendar_events(
+    cal: Calendar, local_tz: tzinfo = LOCAL_TZ
+) -> Tuple[List[Tuple], Dict]:
+    """
+    Split a Calendar's VEVENTs into master events, as (component, start, end)
+    in local time, and recurrence exceptions keyed by (UID, original date),
+    ready to be expanded for any number of windows (see expand_events)
+    """
+    # First, collect all recurrence exceptions
+    exceptions = {}
+    for component in cal.walk("VEVENT"):
+        recurrence_id = component.get("recurrence-id")
+        if recurrence_id:
+            # Get original date and UID to identify the exception
+            uid = component.get("uid")
+            original_date = recurrence_id.dt
+            if not isinstance(original_date, datetime):
+                original_date = datetime.combine(original_date, datetime.min.time())
+            if original_date.tzinfo is None:
+                original_date = local_tz.localize(original_date)
+            else:
+                original_date = original_date.astimezone(local_tz)
+
+            key = (uid, original_date.date())
+            exceptions[key] = component
+
+    masters = []
+    for component in cal.walk("VEVENT"):
+        # Skip recurrence exceptions here - they'll be handled during recurrence expansion
+        if component.get("recurrence-id"):
+            continue
+
+        start = component.get("dtstart").dt
+        end = component.get("dtend").dt
+
+        # Handle timezone and date vs datetime
+        if isinstance(start, datetime):
+            if start.tzinfo is None:
+                start = local_tz.localize(start)
+            else:
+                start = start.astimezone(local_tz)
+        else:
+            start = local_tz.localize(datetime.combine(start, datetime.min.time()))
+
+        if isinstance(end, datetime):
+            if end.tzinfo is None:
+                end = local_tz.localize(end)
+            else:
+                end = end.astimezone(local_tz)
+        else:
+            end = local_tz.localize(datetime.combine(end, datetime.max.time()))
+
+        masters.append((component, start, end))
+    return masters, exceptions
+
+
+def expand_events(
+    masters: List[Tuple],
+    exceptions: Dict,
+    week_start: datetime,
+    week_end: datetime,
+    local_tz: tzinfo = LOCAL_TZ,
+) -> List[Dict]:
+    """
+    Return the events within [week_start, week_end) of an indexed calendar
+    (see index_calendar_events), with recurring events expanded
     """
-    week_start, week_end = get_week_range()
     events = []
-    local_tz = pytz.timezone("America/Denver")
 
     try:
-        with open(ical_path, "rb") as f:
-            cal = Calendar.from_ical(f.read())
-
-            # First, collect all recurrence exceptions
-            exceptions = {}
-            for component in cal.walk("VEVENT"):
-                recurrence_id = component.get("recurrence-id")
-                if recurrence_id:
-                    # Get original date and UID to identify the exception
-                    uid = component.get("uid")
-                    original_date = recurrence_id.dt
-                    if not isinstance(original_date, datetime):
-                        original_date = datetime.combine(
-                            original_date, datetime.min.time()
-                        )
-                    if original_date.tzinfo is None:
-                        original_date = local_tz.localize(original_date)
-                    else:
-                        original_date = original_date.astimezone(local_tz)
-
-                    key = (uid, original_date.date())
-                    exceptions[key] = component
-
-            # Now process all events
-            for component in cal.walk("VEVENT"):
-                # Skip processing recurrence exceptions here - they'll be handled during recurrence expansion
-                if component.get("recurrence-id"):
-                    continue
-
-                start = component.get("dtstart").dt
-                end = component.get("dtend").dt
-
-                # Handle timezone and date vs datetime
-                if isinstance(start, datetime):
-                    if start.tzinfo is None:
-                        start = local_tz.localize(start)
-                    else:
-                        start = start.astimezone(local_tz)
-                else:
-                    start = local_tz.localize(
-                        datetime.combine(start, datetime.min.time())
-                    )
+        for component, start, end in masters:
+            # Handle recurring events
+            if component.get("rrule"):
+                # Expand in the series' own time zone so occurrences keep
+                # their wall-clock time across DST changes; the rule is
+                # compiled once and expansions are memoized per window
+                uid = component.get("uid")
+                rule_start = recurrence_start(component.get("dtstart").dt, local_tz)
+                occurrences = occurrences_between(
+                    str(uid),
+                    int(component.get("sequence", 0)),
+                    rrule_string(component.get("rrule"), rule_start.tzinfo),
+                    rule_start,
+                    week_start,
+                    week_end,
+                )
+                excluded = excluded_dates(component, local_tz)
+                duration = end - start
+
+                # Handle each occurrence
+                for occurrence in occurrences:
+                    occurrence_start = occurrence.astimezone(local_tz)
+                    occurrence_end = local_tz.normalize(occurrence_start + duration)
 
-                if isinstance(end, datetime):
-                    if end.tzinfo is None:
-                        end = local_tz.localize(end)
-                    else:
-                        end = end.astimezone(local_tz)
-                else:
-                    end = local_tz.localize(datetime.combine(end, datetime.max.time()))
-
-                # Handle recurring events
-                if component.get("rrule"):
-                    # Get the recurrence rule
-                    rrule = component.get("rrule")
-
-                    # Process rule values - convert lists to comma-separated strings
-                    rrule_processed = {}
-                    for k, v in rrule.items():
-                        if isinstance(v, list):
-                            # Convert any datetime objects in lists to strings
-                            processed_items = []
-                            for item in v:
-                                if isinstance(item, datetime):
-                                    processed_items.append(
-                                        item.strftime("%Y%m%dT%H%M%SZ")
-                                    )
-                                else:
-                                    processed_items.append(str(item))
-                            rrule_processed[k] = ",".join(processed_items)
-                        else:
-                            # Handle single datetime values
-                            if isinstance(v, datetime):
-                                rrule_processed[k] = v.strftime("%Y%m%dT%H%M%SZ")
+                    # Check if this instance has been moved (has an exception)
+                    exception_key = (uid, occurrence_start.date())
+                    if exception_key in exceptions:
+                        # Use the exception event instead
+                        exception = exceptions[exception_key]
+                        exception_start = exception.get("dtstart").dt
+                        exception_end = exception.get("dtend").dt
+                        if isinstance(exception_start, datetime):
+                            if exception_start.tzinfo is None:
+                                exception_start = local_tz.localize(exception_start)
                             else:
-                                rrule_processed[k] = str(v)
+                                exception_start = exception_start.astimezone(local_tz)
 
-                    # Convert to dateutil rrule string format
-                    rrule_str = "RRULE:" + ";".join(
-                        f"{k}={v}" for k, v in rrule_processed.items()
-                    )
+                            if exception_end.tzinfo is None:
+                                exception_end = local_tz.localize(exception_end)
+                            else:
+                                exception_end = exception_end.astimezone(local_tz)
+
+                            if week_start <= exception_start < week_end:
+                                events.append(
+                                    {
+                                        "summary": str(
+                                            exception.get("summary", "No Title")
+                                        ),
+                                        "start": exception_start,
+                                        "end": exception_end,
+                                        "location": str(
+                                            exception.get("location", "")
+                                        ),
+                                        "description": str(
+                                            exception.get("description", "")
+                                        ),
+                                    }
+                                )
+                        continue
+
+                    # Skip if there's a matching EXDATE
+                    if occurrence_start.date() in excluded:
+                        continue
 
-                    # Get recurrences between week_start and week_end
-                    rule = rrulestr(rrule_str, dtstart=start)
-                    occurrences = rule.between(week_start, week_end, inc=True)
-
-                    # Handle each occurrence
-                    for occurrence_start in occurrences:
-                        # Calculate occurrence end time
-                        duration = end - start
-                        occurrence_end = occurrence_start + duration
-
-                        # Check if this instance has been moved (has an exception)
-                        uid = component.get("uid")
-                        exception_key = (uid, occurrence_start.date())
-                        if exception_key in exceptions:
-                            # Use the exception event instead
-                            exception = exceptions[exception_key]
-                            exception_start = exception.get("dtstart").dt
-                            exception_end = exception.get("dtend").dt
-                            if isinstance(exception_start, datetime):
-                                if exception_start.tzinfo is None:
-                                    exception_start = local_tz.localize(exception_start)
-                                else:
-                                    exception_start = exception_start.astimezone(
-                                        local_tz
-                                    )
-
-                                if exception_end.tzinfo is None:
-                                    exception_end = local_tz.localize(exception_end)
-                                else:
-                                    exception_end = exception_end.astimezone(local_tz)
-
-                                if week_start <= exception_start < week_end:
-                                    events.append(
-                                        {
-                                            "summary": str(
-                                                exception.get("summary", "No Title")
-                                            ),
-                                            "start": exception_start,
-                                            "end": exception_end,
-                                            "location": str(
-                                                exception.get("location", "")
-                                            ),
-                                            "description": str(
-                                                exception.get("description", "")
-                                            ),
-                                        }
-                                    )
-                            continue
-
-                        # Skip if there's a matching EXDATE
-                        if component.get("exdate"):
-                            exdates = component.get("exdate")
-                            if not isinstance(exdates, list):
-                                exdates = [exdates]
-                            skip = False
-                            for exdate in exdates:
-                                excluded_dates = exdate.dts
-                                for excluded in excluded_dates:
-                                    if (
-                                        excluded.dt.astimezone(local_tz).date()
-                                        == occurrence_start.date()
-                                    ):
-                                        skip = True
-                                        break
-                            if skip:
-                                continue
-
-                        events.append(
-                            {
-                                "summary": str(component.get("summary", "No Title")),
-                                "start": occurrence_start,
-                                "end": occurrence_end,
-                                "location": str(component.get("location", "")),
-                                "description": str(component.get("description", "")),
-                            }
-                        )
-                elif week_start <= start < week_end:
                     events.append(
                         {
                             "summary": str(component.get("summary", "No Title")),
-                            "start": start,
-                            "end": end,
+                            "start": occurrence_start,
+                            "end": occurrence_end,
                             "location": str(component.get("location", "")),
                             "description": str(component.get("description", "")),
                         }
                     )
+            elif week_start <= start < week_end:
+                events.append(
+                    {
+                        "summary": str(component.get("summary", "No Title")),
+                        "start": start,
+                        "end": end,
+                        "location": str(component.get("location", "")),
+                        "description": str(component.get("description", "")),
+                    }
+                )
 
         return sorted(events, key=lambda x: x["start"])
 
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+from PIL import Image
+
+from layer_cache import file_digest
+
+# One manifest per photos folder, named after the folder's absolute path
+PHOTO_INDEX_DIR = "data/photo_index"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tiff"}
+INDEX_VERSION = 1
+# A directory modified this recently may still change within the same mtime
+# tick, so it is rescanned rather than trusted
+SETTLE_SECONDS = 2
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def weekly_permutation(cycle_number: int, num_images: int) -> List[int]:
+    """
+    Return the deterministic photo order for one cycle through the library.
+    """
+    cycle_seed = f"cycle_{cycle_number}"
+
+    # Generate a pseudo-random permutation for this cycle
+    indices = list(range(num_images))
+
+    # Simple Fisher-Yates shuffle using our deterministic seed
+    for i in range(num_images - 1, 0, -1):
+        # Generate pseudo-random number for this position
+        pos_seed = f"{cycle_seed}_{i}"
+        pos_hash = hashlib.md5(pos_seed.encode()).hexdigest()
+        j = int(pos_hash, 16) % (i + 1)
+        indices[i], indices[j] = indices[j], indices[i]
+    return indices
+
+
+class PhotoIndex:
+    """
+    Persistent manifest of a photos folder: file names, sizes, mtimes, image
+    dimensions, content digests and the current cycle's photo order.
+
+    The folder is only listed again when its mtime changes (a file was added,
+    removed or renamed), and then only new or modified files are opened, so a
+    large network-mounted library is not rescanned on every run.
+    """
+
+    def __init__(self, photos_folder: str, index_dir: str = PHOTO_INDEX_DIR):
+        self.photos_folder = photos_folder
+        self.path = (
+            Path(index_dir) / f"{quote(os.path.abspath(photos_folder), safe='')}.json"
+        )
+        self.lock = threading.Lock()
+        self.rescans = 0
+        self.files_read = 0
+        self.data = self._load()
+
+    @classmethod
+    def for_folder(cls, photos_folder: str) -> "PhotoIndex":
+        """
+        Return the process-wide index for a folder.
+        """
+        key = os.path.abspath(photos_folder)
+        with _indexes_lock:
+            if key not in _indexes:
+                _indexes[key] = cls(photos_folder)
+            return _indexes[key]
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                return data
+        except (FileNotFoundError, ValueError):
+            pass
+        return {"version": INDEX_VERSION, "dir_mtime_ns": None, "photos": {}}
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(
+                f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            )
+            with open(tmp_path, "w") as f:
+                json.dump(self.data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving photo index: {e}")
+
+    def _refresh(self) -> None:
+        try:
+            dir_mtime_ns = os.stat(self.photos_folder).st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Photos folder '{self.photos_folder}' not found")
+
+        settled = time.time_ns() - dir_mtime_ns > SETTLE_SECONDS * 10**9
+        if settled and dir_mtime_ns == self.data["dir_mtime_ns"]:
+            return
+
+        self.rescans += 1
+        old_photos = self.data["photos"]
+        photos = {}
+        with os.scandir(self.photos_folder) as entries:
+            for entry in entries:
+                if os.path.splitext(entry.name.lower())[1] not in IMAGE_EXTENSIONS:
+                    continue
+                stat = entry.stat()
+                old = old_photos.get(entry.name)
+                if (
+                    old
+                    and old["size"] == stat.st_size
+                    and old["mtime_ns"] == stat.st_mtime_ns
+                ):
+                    photos[entry.name] = old
+                else:
+                    photos[entry.name] = self._describe(entry.path, stat)
+
+        changed = photos.keys() != old_photos.keys()
+        self.data["photos"] = dict(sorted(photos.items()))
+        self.data["dir_mtime_ns"] = dir_mtime_ns if settled else None
+        if changed:
+            self.data.pop("permutation", None)
+        self._save()
+
+    def _describe(self, path: str, stat: os.stat_result) -> Dict:
+        self.files_read += 1
+        width = height = None
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+        except Exception as e:
+            print(f"Error reading photo {path}: {e}")
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "width": width,
+            "height": height,
+        }
+
+    def images(self) -> List[str]:
+        """
+        Return the sorted file names of all images in the folder.
+        """
+        with self.lock:
+            self._refresh()
+            return list(self.data["photos"])
+
+    def photo_for_week(self, week_number: int) -> str:
+        """
+        Return the path of the photo shown in a given week. No image repeats
+        until every image has been shown once.
+        """
+        with self.lock:
+            self._refresh()
+            images = list(self.data["photos"])
+            if not images:
+                raise ValueError("No image files found in the photos folder")
+
+            # Calculate cycle position to ensure no repeats within a full cycle
+            num_images = len(images)
+            cycle_number = week_number // num_images
+            week_in_cycle = week_number % num_images
+
+            permutation = self.data.get("permutation")
+            if (
+                not permutation
+                or permutation["cycle"] != cycle_number
+                or permutation["count"] != num_images
+            ):
+                permutation = {
+                    "cycle": cycle_number,
+                    "count": num_images,
+                    "order": weekly_permutation(cycle_number, num_images),
+                }
+                self.data["permutation"] = permutation
+                self._save()
+
+            # Select the image for this week
+            return os.path.join(
+                self.photos_folder, images[permutation["order"][week_in_cycle]]
+            )
+
+    def digest(self, photo_path: str) -> str:
+        """
+        Return the SHA-256 of a photo in this folder, hashing it only when it
+        is new or has changed since it was last hashed.
+        """
+        name = os.path.basename(photo_path)
+        stat = os.stat(photo_path)
+        with self.lock:
+            entry = self.data["photos"].get(name)
+            if (
+                entry
+                and entry.get("sha256")
+                and entry["size"] == stat.st_size
+                and entry["mtime_ns"] == stat.st_mtime_ns
+            ):
+                return entry["sha256"]
+
+        digest = file_digest(photo_path)
+        with self.lock:
+            entry = self.data["photos"].get(name)
+            if (
+                entry
+                and entry["size"] == stat.st_size
+                and entry["mtime_ns"] == stat.st_mtime_ns
+            ):
+                entry["sha256"] = digest
+                self._save()
+        return digest
+
+    def dimensions(self, photo_path: str) -> Optional[tuple]:
+        """
+        Return (width, height) of an indexed photo, or None if unknown.
+        """
+        with self.lock:
+            entry = self.data["photos"].get(os.path.basename(photo_path))
+        if not entry or entry["width"] is None:
+            return None
+        return entry["width"], entry["height"]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return how many folder rescans and file reads this index has done.
+        """
+        return {
+            "photos": len(self.data["photos"]),
+            "rescans": self.rescans,
+            "files_read": self.files_read,
+        }
+
+
+def photo_digest(photo_path: str) -> str:
+    """
+    Return a photo's SHA-256, reusing the digest stored in its folder's index.
+    """
+    return PhotoIndex.for_folder(os.path.dirname(photo_path) or ".").digest(photo_path)
@@ -0,0 +1,140 @@
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Box reduce() down to at least 2x the target before resampling with LANCZOS;
+# Pillow documents this (its reducing_gap) as very close to a full resize
+REDUCING_GAP = 2.0
+# Modes Image.reduce() handles everywhere; palette, 1-bit and 16-bit images
+# are converted to grayscale before reducing
+REDUCE_MODES = ("L", "RGB", "RGBA")
+
+
+@dataclass
+class StageStats:
+    """
+    Cost of one photo pipeline stage.
+    image_bytes: size of the pixel buffer the stage produced
+    peak_rss: process peak resident memory after the stage, in bytes
+    """
+
+    stage: str
+    seconds: float
+    size: Tuple[int, int]
+    mode: str
+    image_bytes: int
+    peak_rss: Optional[int]
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Return the process's peak resident memory in bytes, if the OS reports it.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def record_stage(stats: Optional[list], stage: str, start: float, img: Image.Image):
+    """
+    Append a StageStats for a stage that began at start and produced img.
+    """
+    if stats is None:
+        return
+    bands = len(img.getbands())
+    bits = 1 if img.mode == "1" else 8 * bands
+    stats.append(
+        StageStats(
+            stage=stage,
+            seconds=time.perf_counter() - start,
+            size=img.size,
+            mode=img.mode,
+            image_bytes=img.width * img.height * bits // 8,
+            peak_rss=peak_rss(),
+        )
+    )
+
+
+def load_photo(
+    photo_path: str, size: Tuple[int, int], stats: Optional[List[StageStats]] = None
+) -> Image.Image:
+    """
+    Decode a photo straight to a grayscale image of exactly size.
+    JPEGs are decoded at the smallest DCT scale that still covers size
+    (Image.draft), in grayscale, so multi-megapixel photos never exist at full
+    resolution in memory. Larger images are box-reduced to within
+    REDUCING_GAP of size before the grayscale conversion and the single
+    LANCZOS resize (images in modes other than REDUCE_MODES are converted to
+    grayscale first).
+    Pass a list as stats to collect per-stage timings and memory use.
+    """
+    start = time.perf_counter()
+    with Image.open(photo_path) as img:
+        if img.format == "JPEG":
+            img.draft("L", size)
+        img.load()
+        record_stage(stats, "decode", start, img)
+
+        # Cheap integer box reduce first, so later stages touch fewer pixels
+        start = time.perf_counter()
+        factor = int(min(img.width / size[0], img.height / size[1]) / REDUCING_GAP)
+        if factor > 1 and img.mode not in REDUCE_MODES:
+            img = img.convert("L")
+        reduced = img.reduce(factor) if factor > 1 else img
+        record_stage(stats, "reduce", start, reduced)
+
+    start = time.perf_counter()
+    gray = reduced if reduced.mode == "L" else reduced.convert("L")
+    record_stage(stats, "grayscale", start, gray)
+
+    start = time.perf_counter()
+    resized = gray.resize(size, Image.LANCZOS)
+    record_stage(stats, "resize", start, resized)
+    return resized
+
+
+def print_stage_stats(stats: List[StageStats]) -> None:
+    """
+    Print one line per stage plus the total time.
+    """
+    for s in stats:
+        peak = f"{s.peak_rss / 2**20:7.1f} MiB" if s.peak_rss is not None else "    n/a"
+        print(
+            f"{s.stage:<10} {s.seconds * 1000:8.1f} ms  "
+            f"{s.size[0]:>5}x{s.size[1]:<5} {s.mode:<2} "
+            f"{s.image_bytes / 2**20:7.2f} MiB buffer  peak RSS {peak}"
+        )
+    print(f"{'total':<10} {sum(s.seconds for s in stats) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    from calendar_image import convert_to_black_and_white
+
+    parser = argparse.ArgumentParser(
+        description="Report time and memory for each stage of loading photos"
+    )
+    parser.add_argument("photos", nargs="+")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--dithering", default="atkinson")
+    args = parser.parse_args()
+
+    for photo_path in args.photos:
+        print(photo_path)
+        stats = []
+        photo = load_photo(photo_path, (args.width, args.height), stats)
+        start = time.perf_counter()
+        bw_photo = convert_to_black_and_white(photo, method=args.dithering)
+        record_stage(stats, "dither", start, bw_photo)
+        print_stage_stats(stats)
@@ -0,0 +1,134 @@
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import FrozenSet, Tuple
+from zoneinfo import ZoneInfo
+
+from dateutil.rrule import rrule, rrulestr
+
+# Rules that can be fast-forwarded to just before a window: a fixed period,
+# with no COUNT to keep and no BY* parts that depend on where the series began
+FAST_FORWARD_FREQS = {"DAILY": 1, "WEEKLY": 7}
+FAST_FORWARD_PARTS = {"FREQ", "INTERVAL", "UNTIL", "BYDAY", "WKST"}
+
+
+def _zone(tz: tzinfo) -> tzinfo:
+    """
+    A time zone whose offsets follow the wall clock (pytz zones do not: a
+    localized pytz datetime keeps its offset when moved across DST).
+    """
+    zone = getattr(tz, "zone", None)
+    if zone and hasattr(tz, "localize"):
+        return timezone.utc if zone == "UTC" else ZoneInfo(zone)
+    return tz
+
+
+def recurrence_start(dtstart, local_tz: tzinfo) -> datetime:
+    """
+    DTSTART as the series is expanded: in its own time zone, so every
+    occurrence keeps the wall-clock time of the first one across DST
+    changes. Floating times and all-day dates are in local time.
+    """
+    if not isinstance(dtstart, datetime):
+        dtstart = datetime.combine(dtstart, datetime.min.time())
+    if dtstart.tzinfo is None:
+        return dtstart.replace(tzinfo=_zone(local_tz))
+    return dtstart.replace(tzinfo=_zone(dtstart.tzinfo))
+
+
+def _until_value(value, tz: tzinfo) -> str:
+    """
+    Format an UNTIL value in UTC, as dateutil requires for aware rules.
+    Floating times are read in the series' zone and dates include the
+    whole day.
+    """
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time.max.replace(microsecond=0))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz)
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def rrule_string(recur, tz: tzinfo) -> str:
+    """
+    The RRULE line for a component's parsed rule (an icalendar vRecur),
+    for a series expanded in time zone tz.
+    """
+    parts = []
+    for key, value in recur.items():
+        values = value if isinstance(value, list) else [value]
+        if key == "UNTIL":
+            values = [_until_value(item, tz) for item in values]
+        parts.append(f"{key}={','.join(str(item) for item in values)}")
+    return "RRULE:" + ";".join(parts)
+
+
+@lru_cache(maxsize=1024)
+def compile_rule(uid: str, sequence: int, rule: str, dtstart: datetime) -> rrule:
+    """
+    Parse a series' rule once; a new SEQUENCE, rule or DTSTART is a new key.
+    """
+    return rrulestr(rule, dtstart=dtstart)
+
+
+def _fast_forward_period(rule: str) -> timedelta:
+    """
+    The period a rule repeats with exactly, or None if it cannot be
+    fast-forwarded (see FAST_FORWARD_PARTS).
+    """
+    parts = dict(part.split("=", 1) for part in rule[len("RRULE:") :].split(";"))
+    if set(parts) - FAST_FORWARD_PARTS or parts.get("FREQ") not in FAST_FORWARD_FREQS:
+        return None
+    if any(day[:1] in "+-0123456789" for day in parts.get("BYDAY", "").split(",") if day):
+        return None
+    return timedelta(days=FAST_FORWARD_FREQS[parts["FREQ"]] * int(parts.get("INTERVAL", 1)))
+
+
+@lru_cache(maxsize=4096)
+def occurrences_between(
+    uid: str,
+    sequence: int,
+    rule: str,
+    dtstart: datetime,
+    window_start: datetime,
+    window_end: datetime,
+) -> Tuple[datetime, ...]:
+    """
+    Start times of a series' occurrences in [window_start, window_end), in
+    the series' own time zone. Results are memoized per window.
+    Long-running daily and weekly series skip straight to the period before
+    the window instead of stepping through every earlier occurrence.
+    """
+    compiled = compile_rule(uid, sequence, rule, dtstart)
+    period = _fast_forward_period(rule)
+    if period is not None and window_start - dtstart > 2 * period:
+        periods = (window_start - dtstart) // period - 1
+        # Adding days to an aware datetime keeps its wall-clock time
+        compiled = compiled.replace(dtstart=dtstart + periods * period)
+    return tuple(
+        occurrence
+        for occurrence in compiled.between(window_start, window_end, inc=True)
+        if occurrence < window_end
+    )
+
+
+def excluded_dates(component, local_tz: tzinfo) -> FrozenSet[date]:
+    """
+    The local dates a component's EXDATEs exclude, for O(1) lookups while
+    expanding it.
+    """
+    exdates = component.get("exdate")
+    if not exdates:
+        return frozenset()
+    if not isinstance(exdates, list):
+        exdates = [exdates]
+    dates = set()
+    for exdate in exdates:
+        for excluded in exdate.dts:
+            value = excluded.dt
+            if not isinstance(value, datetime):
+                dates.add(value)
+            elif value.tzinfo is None:
+                dates.add(value.date())
+            else:
+                dates.add(value.astimezone(local_tz).date())
+    return frozenset(dates)
@@ -0,0 +1,93 @@
+import socket
+
+import pytest
+
+from display_transport import DisplayTransport, pending_frames, queue_frame
+from displays import Display, push_pending_frames
+from epd_stub_server import StubDisplay, start_stub_server
+from image_to_esp import post_frame_body, upload_epd_image
+
+FRAME = bytes(i % 256 for i in range(800 * 480 // 8))
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    # Outbox, last frames and capabilities live under the relative data/
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        display = StubDisplay(**kwargs)
+        server = start_stub_server(display)
+        servers.append(server)
+        return display, "%s:%d" % server.server_address
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _transport(host):
+    return DisplayTransport(host, connect_timeout=1, read_timeout=5, backoff=0)
+
+
+def _closed_port_host():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return "%s:%d" % sock.getsockname()
+
+
+def test_retries_after_503(stub):
+    display, host = stub(fail_requests=2)
+    response = _transport(host).post("/image", FRAME)
+    assert response.status_code == 200
+    assert display.requests == [("POST", "/image")] * 3
+    assert bytes(display.frame) == FRAME
+
+
+def test_failed_probe_queues_frame():
+    host = _closed_port_host()
+    transport = DisplayTransport(host, connect_timeout=0.2, attempts=2, backoff=0)
+    assert transport.probe() is None
+    assert not upload_epd_image(host, FRAME, transport=transport, show_progress=False)
+    assert pending_frames() == [(host, FRAME)]
+
+
+def test_outbox_drained_on_next_run(stub):
+    # Every attempt of the first run (probe and upload) finds the display busy
+    display, host = stub(fail_requests=8)
+    assert not upload_epd_image(
+        host, FRAME, transport=_transport(host), show_progress=False
+    )
+    assert pending_frames() == [(host, FRAME)]
+
+    results = push_pending_frames([Display(name="stub", host=host)])
+    assert [result.ok for result in results] == [True]
+    assert pending_frames() == []
+    assert bytes(display.frame) == FRAME
+
+
+def test_rejected_frame_is_not_queued(stub):
+    # A 400x240 display answers an 800x480 frame with 400 Bad Request
+    _, host = stub(width=400, height=240)
+    queue_frame(host, FRAME)
+    assert not upload_epd_image(
+        host, FRAME, transport=_transport(host), show_progress=False
+    )
+    assert pending_frames() == []
+
+
+def test_415_falls_back_to_raw_body(stub):
+    display, host = stub(packbits=False)
+    compressible = bytes(len(FRAME))
+    response, _ = post_frame_body(
+        _transport(host), "/image", compressible, {"packbits"}
+    )
+    assert response.status_code == 200
+    assert display.requests == [("POST", "/image")] * 2
+    assert bytes(display.frame) == compressible
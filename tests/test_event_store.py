@@ -0,0 +1,52 @@
+import os
+import shutil
+from datetime import date
+from pathlib import Path
+
+from event_store import EventChange, EventStore
+from parse_ical import week_range
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+WEEK = week_range(date(2026, 10, 12))
+
+
+def _store(tmp_path, fixture):
+    ical_path = tmp_path / fixture
+    shutil.copy(FIXTURES / fixture, ical_path)
+    return EventStore(str(ical_path), str(tmp_path / "index"))
+
+
+def _summaries(store):
+    calendar = store.calendar_between(*WEEK)
+    return [str(event["summary"]) for event in calendar.walk("VEVENT")]
+
+
+def test_repeated_uid_keeps_every_event(tmp_path):
+    store = _store(tmp_path, "duplicate_uid.ics")
+    changes = store.sync()
+    assert [change.action for change in changes] == ["insert", "insert"]
+    assert _summaries(store) == ["Dup A", "Dup B"]
+
+    # The keys are stable, so rereading the same contents changes nothing
+    os.utime(store.ical_path, (0, 0))
+    assert store.sync() == []
+    assert store.stats()["components"] == 2
+
+
+def test_change_log_intersects_the_changed_dates(tmp_path):
+    store = _store(tmp_path, "recurring.ics")
+    store.sync()
+    path = Path(store.ical_path)
+    path.write_bytes(path.read_bytes().replace(b"Moved sync", b"Moved retro"))
+    os.utime(path, (0, 0))
+    (change,) = store.sync()
+    assert (change.uid, change.action) == ("weekly-sync", "update")
+    assert change.intersects(*WEEK)
+    assert not change.intersects(*week_range(date(2026, 11, 2)))
+
+
+def test_open_ended_change_intersects_any_window():
+    change = EventChange(1, "weekly-sync", "", "insert", "2026-10-05", None)
+    assert change.intersects(*WEEK)
+    assert not change.intersects(*week_range(date(2026, 9, 1)))
@@ -0,0 +1,95 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from ical_feed import fetch_ical_feed
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """
+    Serves server.body with server.etag, answering 304 to a matching
+    If-None-Match unless server.validators is False.
+    """
+
+    def do_GET(self):
+        self.server.seen.append(self.headers.get("If-None-Match"))
+        etag = self.server.etag
+        if self.server.validators and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/calendar")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        if self.server.validators:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def feed(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+    server.seen = []
+    server.validators = True
+
+    def serve(fixture, etag='"v1"'):
+        server.body = (FIXTURES / fixture).read_bytes()
+        server.etag = etag
+
+    serve("feed.ics")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, serve, "http://%s:%d/calendar.ics" % server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def _fetch(tmp_path, url):
+    save_path = tmp_path / "calendar.ics"
+    return fetch_ical_feed(url, str(save_path), str(tmp_path / "feed.json")), save_path
+
+
+def test_not_modified_skips_download(tmp_path, feed):
+    server, _, url = feed
+    first, save_path = _fetch(tmp_path, url)
+    assert (first.ok, first.changed, first.status) == (True, True, "downloaded")
+    assert save_path.read_bytes() == (FIXTURES / "feed.ics").read_bytes()
+
+    second, _ = _fetch(tmp_path, url)
+    assert (second.ok, second.changed, second.status) == (True, False, "not-modified")
+    assert server.seen == [None, '"v1"']
+
+
+def test_identical_body_is_not_a_change(tmp_path, feed):
+    server, _, url = feed
+    server.validators = False
+    _fetch(tmp_path, url)
+    result, _ = _fetch(tmp_path, url)
+    assert (result.changed, result.status) == (False, "identical")
+    assert not (tmp_path / "calendar.ics.download").exists()
+
+
+def test_changed_body_is_downloaded(tmp_path, feed):
+    _, serve, url = feed
+    _fetch(tmp_path, url)
+    serve("feed_changed.ics", etag='"v2"')
+    result, save_path = _fetch(tmp_path, url)
+    assert (result.changed, result.status) == (True, "downloaded")
+    assert b"SUMMARY:Retro" in save_path.read_bytes()
+
+
+def test_dtstamp_only_change_is_identical(tmp_path, feed):
+    _, serve, url = feed
+    _fetch(tmp_path, url)
+    # A regenerated feed: new ETag and DTSTAMPs, same events
+    serve("feed_dtstamp.ics", etag='"v2"')
+    result, save_path = _fetch(tmp_path, url)
+    assert (result.changed, result.status) == (False, "identical")
+    assert save_path.read_bytes() == (FIXTURES / "feed.ics").read_bytes()
@@ -0,0 +1,50 @@
+from datetime import date
+from pathlib import Path
+
+from ical_stream import (
+    component_properties,
+    component_span,
+    iter_components,
+    load_window_calendar,
+    unfold_lines,
+)
+from parse_ical import week_range
+
+FIXTURES = Path(__file__).parent / "fixtures"
+RECURRING = str(FIXTURES / "recurring.ics")
+
+WEEK = week_range(date(2026, 10, 12))
+
+
+def _spans():
+    spans = {}
+    for _, lines in iter_components(RECURRING):
+        props = component_properties(lines)
+        spans[props["SUMMARY"]] = component_span(props)
+    return spans
+
+
+def test_unfold_lines():
+    with open(RECURRING, "rb") as f:
+        lines = list(unfold_lines(f))
+    assert "SUMMARY:Weekly sync" in lines
+    assert (
+        "DESCRIPTION:A description long enough that the exporter folded it over "
+        "two lines"
+    ) in lines
+    assert not any(line[:1] in (" ", "\t") or line.endswith("\r") for line in lines)
+
+
+def test_count_and_until_bound_the_span():
+    spans = _spans()
+    assert spans["Short course"][1] is not None
+    assert spans["Short course"][1] < WEEK[0].date()
+    assert spans["Old series"][1].isoformat() == "2026-09-30"
+    assert spans["Weekly sync"][1] is None
+    assert spans["Moved sync"] == (WEEK[0].date(), WEEK[0].date())
+
+
+def test_window_prunes_finished_series():
+    calendar = load_window_calendar(RECURRING, *WEEK)
+    summaries = [str(event["summary"]) for event in calendar.walk("VEVENT")]
+    assert summaries == ["Weekly sync", "Moved sync"]
@@ -0,0 +1,27 @@
+import os
+
+from PIL import Image
+
+from layer_cache import FrameStore, LayerCache
+
+FRAME = bytearray(i % 256 for i in range(800 * 480 // 8))
+
+
+def test_frame_store_keeps_packed_bytes(tmp_path):
+    store = FrameStore(str(tmp_path))
+    store.put("week", FRAME)
+    assert (tmp_path / "week.bin").read_bytes() == FRAME
+    assert store.get("week") == FRAME
+    assert store.stats()["hits"] == 1
+
+
+def test_frame_store_evicts_only_its_own_files(tmp_path):
+    LayerCache(str(tmp_path)).put("layer", Image.new("1", (8, 8)))
+    store = FrameStore(str(tmp_path), max_bytes=len(FRAME))
+    store.put("old", FRAME)
+    os.utime(tmp_path / "old.bin", (0, 0))
+    store.max_age = float("inf")
+    store.put("new", FRAME)
+    assert store.get("old") is None
+    assert store.get("new") == FRAME
+    assert (tmp_path / "layer.png").exists()
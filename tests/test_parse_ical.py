@@ -0,0 +1,49 @@
+import shutil
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from parse_ical import CalendarEvents
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture
+def calendar(tmp_path, monkeypatch):
+    # The event index lives under the relative data/
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(FIXTURES / "recurring.ics", tmp_path)
+    return CalendarEvents("recurring.ics")
+
+
+def _times(events):
+    return [(event["summary"], event["start"].replace(tzinfo=None)) for event in events]
+
+
+def test_override_and_exdate_replace_occurrences(calendar):
+    events = calendar.events_by_week([date(2026, 10, 12)])[date(2026, 10, 12)]
+    # Monday moved to Tuesday afternoon, Wednesday excluded
+    assert _times(events) == [("Moved sync", datetime(2026, 10, 13, 15))]
+
+
+def test_series_keeps_wall_clock_time_across_dst(calendar):
+    weeks = calendar.events_by_week([date(2026, 10, 26), date(2026, 11, 2)])
+    assert _times(weeks[date(2026, 11, 2)]) == [
+        ("Weekly sync", datetime(2026, 11, 2, 10)),
+        ("Weekly sync", datetime(2026, 11, 4, 10)),
+    ]
+    before = weeks[date(2026, 10, 26)][0]["start"].utcoffset()
+    after = weeks[date(2026, 11, 2)][0]["start"].utcoffset()
+    assert before - after == timedelta(hours=1)
+    description = weeks[date(2026, 11, 2)][0]["description"]
+    assert description.endswith("folded it over two lines")
+    assert calendar.stats()["parses"] == 1
+
+
+def test_count_and_until_series_end(calendar):
+    events = calendar.events_between(date(2026, 8, 31), date(2026, 9, 7))
+    expected = ["Old series"] + ["Short course"] * 5
+    assert [event["summary"] for event in events] == expected
+    events = calendar.events_between(date(2026, 10, 5), date(2026, 10, 12))
+    assert {event["summary"] for event in events} == {"Weekly sync"}
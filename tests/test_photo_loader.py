@@ -0,0 +1,38 @@
+import pytest
+from PIL import Image
+
+from calendar_image import get_dithered_photo
+from display_profile import DEFAULT_PROFILE
+from layer_cache import LayerCache
+from photo_loader import load_photo
+
+
+def _large_photo(path, mode):
+    img = Image.linear_gradient("L").resize((4000, 3000))
+    if mode == "P":
+        img = img.convert("RGB").quantize(64)
+    elif mode == "I;16":
+        img = img.convert("I").point(lambda value: value * 256).convert("I;16")
+    else:
+        img = img.convert(mode)
+    img.save(path)
+    return path
+
+
+@pytest.mark.parametrize("mode", ["P", "1", "I;16", "L", "RGB"])
+def test_load_photo_reduces_any_mode(tmp_path, mode):
+    path = _large_photo(tmp_path / "photo.png", mode)
+    stats = []
+    photo = load_photo(str(path), (800, 480), stats)
+    assert photo.size == (800, 480)
+    assert photo.mode == "L"
+    reduce_stage = next(stage for stage in stats if stage.stage == "reduce")
+    assert reduce_stage.size[0] < 4000
+
+
+def test_dithered_large_palette_png(tmp_path):
+    path = _large_photo(tmp_path / "palette.png", "P")
+    cache = LayerCache(str(tmp_path / "cache"))
+    photo = get_dithered_photo(str(path), is_weekday=True, cache=cache)
+    assert photo.mode == "1"
+    assert photo.size == DEFAULT_PROFILE.photo_size(True)
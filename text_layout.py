@@ -0,0 +1,79 @@
+from functools import lru_cache
+from typing import Tuple
+
+from PIL import ImageFont
+
+ELLIPSIS = "..."
+
+
+@lru_cache(maxsize=8192)
+def text_width(font: ImageFont.FreeTypeFont, text: str) -> float:
+    """
+    Return the advance width of text in font, memoized per (font, text).
+    Fonts come from the process-wide asset registry, so they hash stably.
+    """
+    return font.getlength(text)
+
+
+@lru_cache(maxsize=1024)
+def wrap_text(
+    text: str, font: ImageFont.FreeTypeFont, max_width: float, max_lines: int = None
+) -> Tuple[str, ...]:
+    """
+    Greedily wrap text into lines no wider than max_width, measuring each
+    word once. A word wider than max_width gets a line of its own, cut short
+    with an ellipsis, as is the last kept line if the text needs more than
+    max_lines lines. Layouts are memoized per (text, font, width).
+    """
+    space = text_width(font, " ")
+    lines = []
+    current = []
+    current_width = 0
+    for word in text.split():
+        word_width = text_width(font, word)
+        if word_width > max_width:
+            # Too wide for any line: give it its own, cut to fit
+            if current:
+                lines.append(" ".join(current))
+            lines.append(ellipsize(word, font, max_width))
+            current, current_width = [], 0
+        elif not current:
+            current, current_width = [word], word_width
+        elif current_width + space + word_width > max_width:
+            lines.append(" ".join(current))
+            current, current_width = [word], word_width
+        else:
+            current.append(word)
+            current_width += space + word_width
+    if current:
+        lines.append(" ".join(current))
+
+    if max_lines is not None and len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = _truncate(lines[-1], font, max_width)
+    return tuple(lines)
+
+
+def ellipsize(text: str, font: ImageFont.FreeTypeFont, max_width: float) -> str:
+    """
+    Return text unchanged if it fits in max_width, otherwise cut short with
+    an ellipsis so that it does.
+    """
+    if text_width(font, text) <= max_width:
+        return text
+    return _truncate(text, font, max_width)
+
+
+def _truncate(text: str, font: ImageFont.FreeTypeFont, max_width: float) -> str:
+    """
+    Return the longest prefix of text that fits in max_width with an
+    ellipsis appended, found by binary search over the prefix length.
+    """
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if text_width(font, text[:mid].rstrip() + ELLIPSIS) <= max_width:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low].rstrip() + ELLIPSIS
@@ -1,8 +1,14 @@
+import json
 import requests
 import random
+import time
+from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
 
+# Last forecast fetched, reused for a few hours since it rarely changes
+WEATHER_CACHE_PATH = "data/cache/weather.json"
+
 
 def geocode_location(location: str) -> Optional[Tuple[float, float]]:
     """
@@ -35,6 +41,19 @@ def get_weather_data(latitude: float = None, longitude: float = None) -> List[Di
     Returns a list of daily weather data for the current week
     If latitude/longitude not provided, defaults to Fort Collins, CO
     """
+    try:
+        return fetch_weather_data(latitude, longitude)
+    except Exception as e:
+        print(f"Error fetching weather data: {e}")
+        # Return default weather data for the week
+        return get_default_weather_data()
+
+
+def fetch_weather_data(latitude: float = None, longitude: float = None) -> List[Dict]:
+    """
+    Fetch this week's daily weather from Open-Meteo
+    Raises on network or API errors instead of falling back to defaults
+    """
     # Default to Fort Collins, CO coordinates if not provided
     if latitude is None:
         latitude = 40.5853
@@ -60,31 +79,76 @@ def get_weather_data(latitude: float = None, longitude: float = None) -> List[Di
         "end_date": end_date,
     }
 
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+    response = requests.get(url, params=params)
+    response.raise_for_status()
+    data = response.json()
 
-        daily_data = data["daily"]
-        weather_days = []
+    daily_data = data["daily"]
+    weather_days = []
 
-        for i in range(len(daily_data["time"])):
-            date = daily_data["time"][i]
-            weather_days.append(
-                {
-                    "date": date,
-                    "temp_max": daily_data["temperature_2m_max"][i],
-                    "temp_min": daily_data["temperature_2m_min"][i],
-                    "weather_code": daily_data["weathercode"][i],
-                    "icon": get_weather_icon(daily_data["weathercode"][i], date),
-                }
-            )
+    for i in range(len(daily_data["time"])):
+        date = daily_data["time"][i]
+        weather_days.append(
+            {
+                "date": date,
+                "temp_max": daily_data["temperature_2m_max"][i],
+                "temp_min": daily_data["temperature_2m_min"][i],
+                "weather_code": daily_data["weathercode"][i],
+                "icon": get_weather_icon(daily_data["weathercode"][i], date),
+            }
+        )
+
+    return weather_days
+
+
+def get_cached_weather_data(
+    latitude: float = None,
+    longitude: float = None,
+    max_age: float = 3 * 3600,
+    cache_path: str = WEATHER_CACHE_PATH,
+) -> List[Dict]:
+    """
+    Like get_weather_data, but reuses a forecast for the same location and
+    week fetched less than max_age seconds ago. If fetching fails, a stale
+    forecast from the same week is preferred over the random defaults.
+    """
+    today = datetime.now()
+    week_start = (today - timedelta(days=today.weekday())).strftime("%Y-%m-%d")
+    location = [latitude, longitude]
+
+    cached = None
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached.get("location") != location or cached.get("week_start") != week_start:
+            cached = None
+    except (FileNotFoundError, ValueError):
+        cached = None
 
-        return weather_days
+    if cached and time.time() - cached.get("fetched_at", 0) < max_age:
+        return cached["days"]
+
+    try:
+        days = fetch_weather_data(latitude, longitude)
     except Exception as e:
         print(f"Error fetching weather data: {e}")
-        # Return default weather data for the week
-        return get_default_weather_data()
+        return cached["days"] if cached else get_default_weather_data()
+
+    try:
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(
+                {
+                    "location": location,
+                    "week_start": week_start,
+                    "fetched_at": time.time(),
+                    "days": days,
+                },
+                f,
+            )
+    except OSError as e:
+        print(f"Error caching weather data: {e}")
+    return days
 
 
 def get_weather_icon(weather_code: int, date: str = None) -> str: